@@ -1,53 +1,49 @@
 
 import os
+import gc
+import glob
 import json
+import zlib
+import hmac
+import hashlib
 import logging
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session
+import time
+import tempfile
+import threading
+from datetime import datetime, timezone
+from flask import (Flask, current_app, g, render_template, request, redirect, url_for, flash, jsonify,
+                   session, make_response, send_from_directory, send_file, before_render_template,
+                   template_rendered)
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+from werkzeug.local import LocalProxy
 from werkzeug.middleware.proxy_fix import ProxyFix
+from storage import open_store, ConflictError, validate_activity_fields, new_activity_record
+import serialization
+from fragment_cache import FragmentCache
+from events import EventLog
+from importer import detect_import_format, import_activities
+from exporter import EXPORT_FORMATS, SHEETS, iter_csv, write_xlsx
+from responsibles import ResponsiblesRegistry
+import metrics
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
-
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Ensure data directory exists
-if not os.path.exists('data'):
-    os.makedirs('data')
-
-# Initialize JSON file if it doesn't exist
+# Default locations of the data files; create_app() takes them from its config
+DATA_DIR = 'data'
 ACTIVITIES_FILE = 'data/activities.json'
-if not os.path.exists(ACTIVITIES_FILE):
-    with open(ACTIVITIES_FILE, 'w') as f:
-        json.dump({"activities": [], "next_id": 1}, f)
-
-# Import responsibles management
+SQLITE_FILE = 'data/activities.db'
 RESPONSIBLES_FILE = 'data/responsibles.json'
+# Failure reports of bulk imports
+IMPORTS_DIR = 'data/imports'
+# Change events for live pages, shared by all worker processes (see events.py)
+EVENTS_FILE = 'data/events.jsonl'
+# Metric values of each worker process, merged by /metrics (see metrics.py)
+METRICS_DIR = 'data/metrics'
 
-def load_responsibles():
-    """Carrega a lista de responsáveis do arquivo"""
-    try:
-        with open(RESPONSIBLES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Lista padrão inicial - será criada automaticamente
-        default = {
-            "managers": ['Aline', 'Fábio', 'Marcos', 'Waldir', 'Mario', 'Washington', 'Wollinger'],
-            "director": "Washington"
-        }
-        # Criar o arquivo com valores padrão
-        with open(RESPONSIBLES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(default, f, ensure_ascii=False, indent=2)
-        return default
-
-# Carregar responsáveis do arquivo
-_responsibles_data = load_responsibles()
-MANAGERS = _responsibles_data['managers']
-DIRECTOR = _responsibles_data['director']
 ACTION_STATUSES = ['Pendente', 'Em Andamento', 'Concluída', 'Cancelada', 'Não Aplicável']
 
+# Most cells a single bulk status update may change
+MAX_BULK_UPDATES = 500
+
 # Status emojis for visual dashboard
 STATUS_EMOJIS = {
     'Pendente': {'emoji': '😡', 'color': 'danger', 'bg': '#fdeaeb'},
@@ -57,23 +53,114 @@ STATUS_EMOJIS = {
     'Não Aplicável': {'emoji': '⚪', 'color': 'light', 'bg': '#f8f9fa'}
 }
 
-def load_data():
-    """Load activities data from JSON file"""
-    try:
-        with open(ACTIVITIES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        logging.error(f"Error loading data: {e}")
-        return {"activities": [], "next_id": 1}
-
-def save_data(data):
-    """Save activities data to JSON file"""
-    try:
-        with open(ACTIVITIES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logging.error(f"Error saving data: {e}")
-        raise
+# Number of history entries per page on the activity detail page
+HISTORY_PAGE_SIZE = 20
+
+CONFLICT_MESSAGE = 'Esta atividade foi alterada por outro usuário. Confira os dados atuais e tente novamente.'
+
+class AppServices:
+    """The stores and caches of one app, opened on first use
+
+    Creating an app touches no file: the activity store (which may migrate
+    or index the data) is opened by the first request that needs it, and
+    the responsibles file is read by the first request that checks a user.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.responsibles = ResponsiblesRegistry(config['RESPONSIBLES_FILE'])
+        # Rendered dashboard rows, reused until their activity changes (size in characters)
+        self.fragment_cache = FragmentCache(config['FRAGMENT_CACHE_SIZE'])
+        self.event_log = EventLog(config['EVENTS_FILE'])
+        # Each open /events stream holds a server thread for as long as its page is open
+        self.event_streams = threading.BoundedSemaphore(config['MAX_EVENT_STREAMS'])
+        self._activity_store = None
+        self._code_version = None
+        self._lock = threading.Lock()
+
+    @property
+    def activity_store(self):
+        if self._activity_store is None:
+            with self._lock:
+                if self._activity_store is None:
+                    self._activity_store = self._open_store()
+        return self._activity_store
+
+    def _open_store(self):
+        config = self.config
+        os.makedirs(config['DATA_DIR'], exist_ok=True)
+        if config['STORAGE_BACKEND'] == 'json' and not os.path.exists(config['ACTIVITIES_FILE']):
+            with open(config['ACTIVITIES_FILE'], 'w') as f:
+                json.dump({"activities": [], "next_id": 1}, f)
+        return open_store(config['STORAGE_BACKEND'], config['ACTIVITIES_FILE'],
+                          config['SQLITE_FILE'], config['DATA_FORMAT'])
+
+    def code_version(self, app):
+        """Newest mtime of this module and the templates: pages are also stale when they change"""
+        if self._code_version is None:
+            self._code_version = max(
+                os.stat(path).st_mtime_ns for path in
+                [__file__, *glob.glob(os.path.join(app.root_path, app.template_folder, '*.html'))])
+        return self._code_version
+
+def services():
+    """Return the AppServices of the current app"""
+    return current_app.extensions['activities']
+
+# Module-level names for the services of the app handling the request
+activity_store = LocalProxy(lambda: services().activity_store)
+responsibles = LocalProxy(lambda: services().responsibles)
+fragment_cache = LocalProxy(lambda: services().fragment_cache)
+event_log = LocalProxy(lambda: services().event_log)
+
+# One record per request; routine ones are DEBUG (and sampled), slow ones WARNING
+request_logger = logging.getLogger('app.request')
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    # Once per process; measuring itself only starts after a scrape of /metrics
+    metrics.REGISTRY.start(current_app.config['METRICS_DIR'])
+
+def log_request(response):
+    """Log the status and duration of a request (route and user are added by logging_setup)"""
+    duration_ms = (time.perf_counter() - g.request_started) * 1000
+    level = logging.WARNING if duration_ms >= current_app.config['SLOW_REQUEST_MS'] else logging.DEBUG
+    if request_logger.isEnabledFor(level):
+        request_logger.log(level, f'{request.method} {request.path} {response.status_code}',
+                           extra={'status': response.status_code, 'duration_ms': round(duration_ms, 1)})
+    return response
+
+def record_request_metrics(response):
+    """Count the request and observe its duration and sizes, by route"""
+    if metrics.REGISTRY.enabled:
+        # The rule, not the path, so that ids do not make a series each
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUESTS.inc(1, rule, request.method, str(response.status_code))
+        metrics.HTTP_REQUEST_DURATION.observe(time.perf_counter() - g.request_started, rule, request.method)
+        if request.content_length:
+            metrics.HTTP_REQUEST_BYTES.inc(request.content_length, rule)
+        if response.content_length:
+            metrics.HTTP_RESPONSE_BYTES.inc(response.content_length, rule)
+    return response
+
+def start_template_timer(sender, template, context, **extra):
+    if metrics.REGISTRY.enabled:
+        g.setdefault('template_started', []).append(time.perf_counter())
+
+def record_template_render(sender, template, context, **extra):
+    started = g.get('template_started')
+    if started:
+        metrics.TEMPLATE_RENDER_DURATION.observe(time.perf_counter() - started.pop(), template.name)
+
+# Routes are collected here and added to each app by create_app()
+_routes = []
+
+def route(rule, **options):
+    """Like app.route(), for the app create_app() builds"""
+    def decorator(view_func):
+        _routes.append((rule, view_func, options))
+        return view_func
+    return decorator
 
 def validate_comment(comment):
     """Validate that comment has maximum 5 words"""
@@ -82,121 +169,212 @@ def validate_comment(comment):
     words = comment.strip().split()
     return len(words) <= 5
 
-def add_to_history(activity, action, user, comment=""):
-    """Add an entry to activity history"""
-    if 'history' not in activity:
-        activity['history'] = []
-    
-    activity['history'].append({
+def validate_status_change(new_status, status_comment, justification):
+    """Return the error message for an invalid status change, or None"""
+    if new_status not in ACTION_STATUSES:
+        return 'Status inválido.'
+    if status_comment and not validate_comment(status_comment):
+        return 'Comentário deve ter no máximo 5 palavras.'
+    if new_status == 'Pendente' and not justification:
+        return 'Justificativa é obrigatória para status pendente.'
+    return None
+
+def set_person_status(activity, person, new_status, status_comment, justification):
+    """Set the status of one responsible and return the previous one"""
+    old_status = activity['responsible_status'].get(person, {}).get('status', 'Pendente')
+    activity['responsible_status'][person] = {
+        'status': new_status,
+        'comment': status_comment,
+        'justification': justification if new_status == 'Pendente' else '',
+        'justification_approved': False
+    }
+    return old_status
+
+def decide_justification(activity, person, approve):
+    """Approve or reject a justification; a rejected one moves the person to Em Andamento"""
+    activity['responsible_status'][person]['justification_approved'] = approve
+    if not approve:
+        activity['responsible_status'][person]['status'] = 'Em Andamento'
+
+def publish_change(op, activity_id, activity=None):
+    """Tell open pages that an activity changed
+
+    op is the journal operation: 'create', 'status', 'approve', 'reject',
+    'edit' or 'delete', or 'import' after a bulk import (without an
+    activity). Events carry what the pages need to patch the
+    activity in place, plus the dashboard counters.
+    """
+    data = {'id': activity_id, 'counters': activity_store.status_counts()}
+    if activity is not None:
+        data.update({
+            'version': activity['version'],
+            'title': activity['title'],
+            'deadline': activity['deadline'],
+            'responsible': activity['responsible'],
+            'responsible_status': activity['responsible_status'],
+            'overall_status': activity['overall_status']
+        })
+    try:
+        event_log.publish(op, data)
+    except OSError as e:
+        logging.error(f"Error publishing {op} event for activity {activity_id}: {e}")
+
+def history_entry(action, user, comment=""):
+    """Build one activity history entry, stamped with the current time"""
+    return {
         'timestamp': datetime.now().isoformat(),
         'action': action,
         'user': user,
         'comment': comment
-    })
+    }
 
-def reload_responsibles():
-    """Recarrega a lista de responsáveis do arquivo"""
-    global MANAGERS, DIRECTOR
-    _responsibles_data = load_responsibles()
-    MANAGERS = _responsibles_data['managers']
-    DIRECTOR = _responsibles_data['director']
-
-def get_activity_overall_status(activity):
-    """Calculate overall activity status based on individual statuses"""
-    if 'responsible_status' not in activity or not activity['responsible_status']:
-        return 'Pendente'
-    
-    statuses = [s.get('status', 'Pendente') for s in activity['responsible_status'].values()]
-    
-    if not statuses:
-        return 'Pendente'
-    
-    # If all completed, activity is completed
-    if all(s == 'Concluída' for s in statuses):
-        return 'Concluída'
-    
-    # If all cancelled or NA, activity is cancelled
-    if all(s in ['Cancelada', 'Não Aplicável'] for s in statuses):
-        return 'Cancelada'
-    
-    # If any in progress, activity is in progress
-    if any(s == 'Em Andamento' for s in statuses):
-        return 'Em Andamento'
-    
-    # Otherwise, pending
-    return 'Pendente'
+def add_to_history(activity_id, action, user, comment=""):
+    """Add an entry to activity history (kept apart from the activity record)"""
+    activity_store.append_history(activity_id, history_entry(action, user, comment))
+
+def page_validators(page, current_user):
+    """Return (ETag, Last-Modified) for a page of current_user
+
+    Built from the data version of the activity store and the signature of
+    the responsibles file, so computing them does not load the activities.
+    """
+    signature = responsibles.current().signature
+    version = f'{page}|{current_user}|{activity_store.data_version()}|{signature}|{services().code_version(current_app)}'
+    etag = hashlib.sha1(version.encode('utf-8')).hexdigest()[:20]
+    modified = max(activity_store.modified_time(), signature[0] / 1e9 if signature else 0)
+    return etag, datetime.fromtimestamp(modified, timezone.utc)
+
+def cache_page(response, etag, last_modified):
+    """Tag a page response so the browser revalidates it on every view"""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response
+
+def page_not_modified(etag, last_modified):
+    """Return a 304 response if the browser's copy of the page is current, otherwise None"""
+    # A flash message waiting to be shown means the page has to be rendered
+    if session.get('_flashes'):
+        return None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return cache_page(current_app.response_class(status=304), etag, last_modified)
+
+def render_activity_rows(template_name, activities, **context):
+    """Render a row partial for each activity, reusing cached rows
+
+    A row is keyed by activity id and version plus the manager list (the
+    matrix columns), so after a change only the changed rows are rendered.
+    """
+    template = current_app.jinja_env.get_template(template_name)
+    managers = responsibles.current().managers
+    rows = []
+    for activity in activities:
+        key = (template_name, activity['id'], activity.get('version', 0), managers)
+        rows.append(fragment_cache.get_or_render(key, lambda: render_row(template, activity, managers, context)))
+    return rows
+
+def render_row(template, activity, managers, context):
+    # Partials are rendered directly, which sends no template signals
+    with metrics.TEMPLATE_RENDER_DURATION.time(template.name):
+        return Markup(template.render(activity=activity, managers=managers, **context))
+
+def wants_json():
+    """True for fetch calls from the dashboard script, which update the page in place"""
+    return (request.accept_mimetypes.best == 'application/json' or
+            request.headers.get('X-Requested-With') == 'XMLHttpRequest')
+
+def dashboard_reply(message, status=200, activity=None, endpoint='dashboard'):
+    """Answer a dashboard form post
+
+    Plain form posts get the message flashed and a redirect. Fetch calls get
+    JSON instead: the message, plus the activity's per-person status,
+    overall status and the dashboard counters when it was changed.
+    """
+    if not wants_json():
+        flash(message)
+        return redirect(url_for(endpoint))
+    if status >= 400:
+        return api_error(message, status)
+    data = {'message': message}
+    if activity is not None:
+        data.update({
+            'id': activity['id'],
+            'version': activity['version'],
+            'responsible_status': activity['responsible_status'],
+            'overall_status': activity['overall_status'],
+            'counters': activity_store.status_counts()
+        })
+    return api_response(data)
 
-@app.route('/')
+@route('/')
 def index():
     """Main page showing activities list"""
+    current_user = session.get('current_user', 'Aline')
+    # What the error page shows if even the responsibles cannot be read
+    managers = ()
     try:
-        reload_responsibles()  # Recarregar responsáveis
-        data = load_data()
-        current_user = session.get('current_user', 'Aline')
+        people = responsibles.current()
+        managers = people.managers
+        etag, last_modified = page_validators('index', current_user)
+        not_modified = page_not_modified(etag, last_modified)
+        if not_modified:
+            return not_modified
+        
+        # Read before the activities, so a change made meanwhile is not missed by pollDataVersion()
+        data_version = activity_store.data_version()
         
         # Filter activities based on user role
-        if current_user == DIRECTOR:
-            activities = data['activities']
+        if current_user == people.director:
+            activities = activity_store.list_activities()
         else:
             # Show only activities assigned to current user
-            activities = [act for act in data['activities'] 
-                         if current_user in act.get('responsible', [])]
-        
-        # Calculate overall status for each activity
-        for activity in activities:
-            activity['overall_status'] = get_activity_overall_status(activity)
+            activities = activity_store.list_activities(responsible=current_user)
         
-        return render_template('index.html', 
-                             activities=activities, 
-                             current_user=current_user,
-                             managers=MANAGERS)
+        response = make_response(render_template('index.html', 
+                                                 activities=activities, 
+                                                 current_user=current_user,
+                                                 managers=people.managers,
+                                                 data_version=data_version))
+        return cache_page(response, etag, last_modified)
     except Exception as e:
         logging.error(f"Error in index: {e}")
         flash('Erro ao carregar atividades.')
-        return render_template('index.html', activities=[], current_user='Aline', managers=MANAGERS)
+        return render_template('index.html', activities=[], current_user='Aline', managers=managers)
 
-@app.route('/set_user/<username>')
+@route('/set_user/<username>')
 def set_user(username):
     """Set current user (for demo purposes)"""
-    if username in MANAGERS:
+    people = responsibles.current()
+    if username in people.manager_set:
         session['current_user'] = username
         flash(f'Usuário alterado para {username}')
     return redirect(url_for('index'))
 
-@app.route('/dashboard')
+@route('/dashboard')
 def dashboard():
     """Director dashboard for approval management"""
+    current_user = session.get('current_user', 'Washington')
+    # What the error page shows if even the responsibles cannot be read
+    managers = ()
     try:
-        reload_responsibles()  # Recarregar responsáveis
-        current_user = session.get('current_user', 'Washington')
-        if current_user != DIRECTOR:
+        people = responsibles.current()
+        managers = people.managers
+        # Only the director is ever sent the page, so a match implies access
+        etag, last_modified = page_validators('dashboard', current_user)
+        not_modified = page_not_modified(etag, last_modified)
+        if not_modified:
+            return not_modified
+        
+        if current_user != people.director:
             flash('Acesso negado. Apenas o diretor pode acessar o dashboard.')
             return redirect(url_for('index'))
         
-        data = load_data()
-        activities = data.get('activities', [])
-        
-        # Initialize responsible_status for activities that don't have it
-        for activity in activities:
-            if 'responsible_status' not in activity:
-                activity['responsible_status'] = {}
-                responsible_list = activity.get('responsible', [])
-                if isinstance(responsible_list, str):
-                    responsible_list = [responsible_list]
-                for person in responsible_list:
-                    activity['responsible_status'][person] = {
-                        'status': 'Pendente',
-                        'comment': '',
-                        'justification': '',
-                        'justification_approved': False
-                    }
-            
-            # Calculate overall status for each activity
-            activity['overall_status'] = get_activity_overall_status(activity)
-            
-            # Ensure responsible is always a list for template
-            if isinstance(activity.get('responsible'), str):
-                activity['responsible'] = [activity['responsible']]
+        data_version = activity_store.data_version()
+        # Records are normalized by the store: responsible is a list, every
+        # responsible has a responsible_status entry and overall_status is set
+        activities = activity_store.list_activities()
         
         # Filter pending justifications
         pending_justifications = []
@@ -212,27 +390,108 @@ def dashboard():
                             'status_info': status_info
                         })
         
-        return render_template('dashboard.html', 
-                             activities=activities,
-                             pending_justifications=pending_justifications,
-                             current_user=current_user,
-                             managers=MANAGERS,
-                             status_emojis=STATUS_EMOJIS)
+        matrix_rows = render_activity_rows('partials/dashboard_matrix_row.html', activities,
+                                           status_emojis=STATUS_EMOJIS)
+        list_rows = render_activity_rows('partials/dashboard_list_row.html', activities,
+                                         status_emojis=STATUS_EMOJIS)
+        
+        response = make_response(render_template('dashboard.html', 
+                                                 activities=activities,
+                                                 matrix_rows=matrix_rows,
+                                                 list_rows=list_rows,
+                                                 counters=activity_store.status_counts(),
+                                                 pending_justifications=pending_justifications,
+                                                 current_user=current_user,
+                                                 managers=people.managers,
+                                                 status_emojis=STATUS_EMOJIS,
+                                                 data_version=data_version))
+        return cache_page(response, etag, last_modified)
     except Exception as e:
         logging.error(f"Error in dashboard: {e}", exc_info=True)
         flash('Erro ao carregar dashboard.')
         return render_template('dashboard.html', 
                              activities=[],
+                             counters={'total': 0, 'overall': {}, 'by_responsible': {}},
                              pending_justifications=[],
                              current_user=current_user,
-                             managers=MANAGERS,
+                             managers=managers,
                              status_emojis=STATUS_EMOJIS)
 
-@app.route('/add_activity', methods=['GET', 'POST'])
+@route('/dashboard/rows/<int:activity_id>')
+def dashboard_rows(activity_id):
+    """Matrix and list rows of one activity, for live dashboard updates"""
+    current_user = session.get('current_user', 'Washington')
+    people = responsibles.current()
+    if current_user != people.director:
+        return jsonify({'error': 'Acesso negado.'}), 403
+    
+    activity = activity_store.get_activity(activity_id)
+    if not activity:
+        return jsonify({'error': 'Atividade não encontrada.'}), 404
+    
+    matrix_row, = render_activity_rows('partials/dashboard_matrix_row.html', [activity],
+                                       status_emojis=STATUS_EMOJIS)
+    list_row, = render_activity_rows('partials/dashboard_list_row.html', [activity],
+                                     status_emojis=STATUS_EMOJIS)
+    return jsonify({'version': activity.get('version', 0), 'matrix': matrix_row, 'list': list_row})
+
+def event_visibility(current_user):
+    """Return visible(event_type, data) for the /events stream of current_user
+
+    The director sees every event. Anyone else gets the activity data only
+    for activities they are responsible for (as on /activity/<id>), and for
+    other activities just the id, so a page can drop a card its user no
+    longer has access to; creations of other activities are skipped. The
+    responsibles are checked per event, so a stream follows director changes.
+    """
+    registry = services().responsibles
+
+    def visible(event_type, data):
+        if current_user == registry.current().director:
+            return data
+        if current_user in data.get('responsible', ()):
+            return {key: value for key, value in data.items() if key != 'counters'}
+        if event_type == 'create':
+            return None
+        return {'id': data.get('id')}
+
+    return visible
+
+@route('/events')
+def events():
+    """Server-Sent Events stream of the activity changes current_user may see
+
+    At most MAX_EVENT_STREAMS streams are open per process, so that open
+    pages cannot take every server thread; past that the page is told to
+    poll /events/version instead (a 503 makes EventSource give up).
+    """
+    slots = services().event_streams
+    if not slots.acquire(blocking=False):
+        response = jsonify({'error': 'Atualizações ao vivo indisponíveis no momento.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    current_user = session.get('current_user', 'Aline')
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = current_app.response_class(event_log.stream(last_event_id, event_visibility(current_user)),
+                                          mimetype='text/event-stream')
+    # Closing the response (client gone, server stopping) frees the slot
+    response.call_on_close(slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx-style proxies to pass events through as they are written
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@route('/events/version')
+def events_version():
+    """Current data version, polled by pages that could not open an /events stream"""
+    return jsonify({'version': activity_store.data_version()})
+
+@route('/add_activity', methods=['GET', 'POST'])
 def add_activity():
     """Add new activity"""
-    reload_responsibles()  # Recarregar responsáveis
     current_user = session.get('current_user', 'Aline')
+    people = responsibles.current()
     
     if request.method == 'POST':
         try:
@@ -241,78 +500,53 @@ def add_activity():
             deadline = request.form.get('deadline', '').strip()
             responsible = request.form.getlist('responsible')
             
-            # Validation
-            if not all([title, description, deadline]) or not responsible:
-                flash('Todos os campos são obrigatórios.')
-                return render_template('add_activity.html', managers=MANAGERS, current_user=current_user)
-            
-            # Validate all responsibles
-            for resp in responsible:
-                if resp not in MANAGERS:
-                    flash('Responsável inválido.')
-                    return render_template('add_activity.html', managers=MANAGERS, current_user=current_user)
-            
-            # Load data and add new activity
-            data = load_data()
-            
-            # Initialize individual status for each responsible
-            responsible_status = {}
-            for person in responsible:
-                responsible_status[person] = {
-                    'status': 'Pendente',
-                    'comment': '',
-                    'justification': '',
-                    'justification_approved': False
-                }
-            
-            new_activity = {
-                'id': data['next_id'],
-                'title': title,
-                'description': description,
-                'deadline': deadline,
-                'responsible': responsible,
-                'responsible_status': responsible_status,
-                'created_by': current_user,
-                'created_at': datetime.now().isoformat(),
-                'history': []
-            }
+            # Validation (required fields and known responsibles)
+            error = validate_activity_fields(title, description, deadline, responsible, people.manager_set)
+            if error:
+                flash(error)
+                return render_template('add_activity.html', managers=people.managers, current_user=current_user)
             
-            add_to_history(new_activity, 'Criada', current_user)
-            
-            data['activities'].append(new_activity)
-            data['next_id'] += 1
-            save_data(data)
+            new_activity = new_activity_record(title, description, deadline, responsible, current_user)
+            new_activity = activity_store.add_activity(new_activity)
+            publish_change('create', new_activity['id'], new_activity)
+            add_to_history(new_activity['id'], 'Criada', current_user)
             
             flash('Atividade criada com sucesso!')
             return redirect(url_for('index'))
         except Exception as e:
             logging.error(f"Error adding activity: {e}")
             flash('Erro ao criar atividade.')
-            return render_template('add_activity.html', managers=MANAGERS, current_user=current_user)
+            return render_template('add_activity.html', managers=people.managers, current_user=current_user)
     
-    return render_template('add_activity.html', managers=MANAGERS, current_user=current_user)
+    return render_template('add_activity.html', managers=people.managers, current_user=current_user)
 
-@app.route('/activity/<int:activity_id>')
+@route('/activity/<int:activity_id>')
 def activity_detail(activity_id):
     """Show activity details and allow status updates"""
     try:
         current_user = session.get('current_user', 'Aline')
-        data = load_data()
-        
-        activity = next((act for act in data['activities'] if act['id'] == activity_id), None)
+        people = responsibles.current()
+        activity = activity_store.get_activity(activity_id)
         if not activity:
             flash('Atividade não encontrada.')
             return redirect(url_for('index'))
         
         # Check permission
-        if current_user != DIRECTOR and current_user not in activity.get('responsible', []):
+        if current_user != people.director and current_user not in activity.get('responsible', []):
             flash('Você não tem permissão para visualizar esta atividade.')
             return redirect(url_for('index'))
         
-        activity['overall_status'] = get_activity_overall_status(activity)
+        # History is paginated, newest entries first
+        page = max(request.args.get('page', 1, type=int), 1)
+        history, history_total = activity_store.get_history(
+            activity_id, offset=(page - 1) * HISTORY_PAGE_SIZE, limit=HISTORY_PAGE_SIZE)
+        history_pages = max((history_total + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE, 1)
         
         return render_template('activity_detail.html', 
                              activity=activity, 
+                             history=history,
+                             history_page=page,
+                             history_pages=history_pages,
                              current_user=current_user,
                              statuses=ACTION_STATUSES,
                              status_emojis=STATUS_EMOJIS)
@@ -321,20 +555,19 @@ def activity_detail(activity_id):
         flash('Erro ao carregar atividade.')
         return redirect(url_for('index'))
 
-@app.route('/update_status/<int:activity_id>', methods=['POST'])
+@route('/update_status/<int:activity_id>', methods=['POST'])
 def update_status(activity_id):
     """Update activity status for current user"""
     try:
         current_user = session.get('current_user', 'Aline')
-        data = load_data()
-        
-        activity = next((act for act in data['activities'] if act['id'] == activity_id), None)
+        people = responsibles.current()
+        activity = activity_store.get_activity(activity_id)
         if not activity:
             flash('Atividade não encontrada.')
             return redirect(url_for('index'))
         
         # Check permission
-        if current_user != DIRECTOR and current_user not in activity.get('responsible', []):
+        if current_user != people.director and current_user not in activity.get('responsible', []):
             flash('Você não tem permissão para atualizar esta atividade.')
             return redirect(url_for('index'))
         
@@ -342,175 +575,305 @@ def update_status(activity_id):
         status_comment = request.form.get('status_comment', '').strip()
         justification = request.form.get('justification', '').strip()
         
-        # Validate status
-        if new_status not in ACTION_STATUSES:
-            flash('Status inválido.')
-            return redirect(url_for('activity_detail', activity_id=activity_id))
-        
-        # Validate comment length (5 words max)
-        if status_comment and not validate_comment(status_comment):
-            flash('Comentário deve ter no máximo 5 palavras.')
-            return redirect(url_for('activity_detail', activity_id=activity_id))
-        
-        # Check if justification is required for pending status
-        if new_status == 'Pendente' and not justification:
-            flash('Justificativa é obrigatória para status pendente.')
+        # Validate status, comment length (5 words max) and justification
+        error = validate_status_change(new_status, status_comment, justification)
+        if error:
+            flash(error)
             return redirect(url_for('activity_detail', activity_id=activity_id))
         
-        # Initialize responsible_status if not exists
-        if 'responsible_status' not in activity:
-            activity['responsible_status'] = {}
-            for person in activity.get('responsible', []):
-                activity['responsible_status'][person] = {
-                    'status': 'Pendente',
-                    'comment': '',
-                    'justification': '',
-                    'justification_approved': False
-                }
-        
         # Update status for current user
-        old_status = activity['responsible_status'].get(current_user, {}).get('status', 'Pendente')
+        old_status = set_person_status(activity, current_user, new_status, status_comment, justification)
         
-        activity['responsible_status'][current_user] = {
-            'status': new_status,
-            'comment': status_comment,
-            'justification': justification if new_status == 'Pendente' else '',
-            'justification_approved': False
-        }
+        activity = activity_store.update_activity(activity, op='status')
+        publish_change('status', activity_id, activity)
         
         # Add to history
         action = f'{current_user}: Status alterado de "{old_status}" para "{new_status}"'
-        add_to_history(activity, action, current_user, status_comment)
-        
-        save_data(data)
+        add_to_history(activity_id, action, current_user, status_comment)
         flash('Status atualizado com sucesso!')
         return redirect(url_for('activity_detail', activity_id=activity_id))
+    except ConflictError:
+        flash(CONFLICT_MESSAGE)
+        return redirect(url_for('activity_detail', activity_id=activity_id))
     except Exception as e:
         logging.error(f"Error updating status: {e}")
         flash('Erro ao atualizar status.')
         return redirect(url_for('index'))
 
-@app.route('/approve_justification/<int:activity_id>/<person>', methods=['POST'])
+@route('/approve_justification/<int:activity_id>/<person>', methods=['POST'])
 def approve_justification(activity_id, person):
     """Approve or reject justification (Director only)"""
     try:
         current_user = session.get('current_user', 'Washington')
+        people = responsibles.current()
         
-        if current_user != DIRECTOR:
-            flash('Apenas o diretor pode aprovar justificativas.')
-            return redirect(url_for('index'))
+        if current_user != people.director:
+            return dashboard_reply('Apenas o diretor pode aprovar justificativas.', 403, endpoint='index')
         
-        data = load_data()
-        activity = next((act for act in data['activities'] if act['id'] == activity_id), None)
+        activity = activity_store.get_activity(activity_id)
         if not activity:
-            flash('Atividade não encontrada.')
-            return redirect(url_for('dashboard'))
+            return dashboard_reply('Atividade não encontrada.', 404)
         
         action = request.form.get('action')
         director_comment = request.form.get('director_comment', '').strip()
         
         if person not in activity.get('responsible_status', {}):
-            flash('Pessoa não encontrada na atividade.')
-            return redirect(url_for('dashboard'))
+            return dashboard_reply('Pessoa não encontrada na atividade.', 404)
         
         if action == 'approve':
-            activity['responsible_status'][person]['justification_approved'] = True
-            add_to_history(activity, f'Justificativa de {person} aprovada', current_user, director_comment)
-            flash(f'Justificativa de {person} aprovada!')
+            decide_justification(activity, person, True)
+            activity = activity_store.update_activity(activity, op=action)
+            publish_change(action, activity_id, activity)
+            add_to_history(activity_id, f'Justificativa de {person} aprovada', current_user, director_comment)
+            return dashboard_reply(f'Justificativa de {person} aprovada!', activity=activity)
         elif action == 'reject':
-            activity['responsible_status'][person]['justification_approved'] = False
-            activity['responsible_status'][person]['status'] = 'Em Andamento'
-            add_to_history(activity, f'Justificativa de {person} rejeitada', current_user, director_comment)
-            flash(f'Justificativa de {person} rejeitada. Status alterado para Em Andamento.')
+            decide_justification(activity, person, False)
+            activity = activity_store.update_activity(activity, op=action)
+            publish_change(action, activity_id, activity)
+            add_to_history(activity_id, f'Justificativa de {person} rejeitada', current_user, director_comment)
+            return dashboard_reply(f'Justificativa de {person} rejeitada. Status alterado para Em Andamento.',
+                                   activity=activity)
         
-        save_data(data)
-        return redirect(url_for('dashboard'))
+        return dashboard_reply('Ação inválida.', 400)
+    except ConflictError:
+        return dashboard_reply(CONFLICT_MESSAGE, 409)
     except Exception as e:
         logging.error(f"Error approving justification: {e}")
-        flash('Erro ao processar justificativa.')
-        return redirect(url_for('dashboard'))
+        return dashboard_reply('Erro ao processar justificativa.', 500)
 
-@app.route('/quick_update_status/<int:activity_id>/<person>', methods=['POST'])
+@route('/quick_update_status/<int:activity_id>/<person>', methods=['POST'])
 def quick_update_status(activity_id, person):
     """Quick update activity status from dashboard"""
     try:
         current_user = session.get('current_user', 'Washington')
-        data = load_data()
-        
-        activity = next((act for act in data['activities'] if act['id'] == activity_id), None)
+        people = responsibles.current()
+        activity = activity_store.get_activity(activity_id)
         if not activity:
-            flash('Atividade não encontrada.')
-            return redirect(url_for('dashboard'))
+            return dashboard_reply('Atividade não encontrada.', 404)
         
         # Check permission
-        if current_user != DIRECTOR and current_user != person:
-            flash('Você não tem permissão para atualizar este status.')
-            return redirect(url_for('dashboard'))
+        if current_user != people.director and current_user != person:
+            return dashboard_reply('Você não tem permissão para atualizar este status.', 403)
         
         new_status = request.form.get('status')
         status_comment = request.form.get('status_comment', '').strip()
         justification = request.form.get('justification', '').strip()
         
-        # Validate status
-        if new_status not in ACTION_STATUSES:
-            flash('Status inválido.')
-            return redirect(url_for('dashboard'))
-        
-        # Validate comment length
-        if status_comment and not validate_comment(status_comment):
-            flash('Comentário deve ter no máximo 5 palavras.')
-            return redirect(url_for('dashboard'))
-        
-        # Check justification for pending status
-        if new_status == 'Pendente' and not justification:
-            flash('Justificativa é obrigatória para status pendente.')
-            return redirect(url_for('dashboard'))
-        
-        # Initialize responsible_status if not exists
-        if 'responsible_status' not in activity:
-            activity['responsible_status'] = {}
-            for p in activity.get('responsible', []):
-                activity['responsible_status'][p] = {
-                    'status': 'Pendente',
-                    'comment': '',
-                    'justification': '',
-                    'justification_approved': False
-                }
+        # Validate status, comment length and justification
+        error = validate_status_change(new_status, status_comment, justification)
+        if error:
+            return dashboard_reply(error, 400)
         
         # Update status for person
-        old_status = activity['responsible_status'].get(person, {}).get('status', 'Pendente')
+        old_status = set_person_status(activity, person, new_status, status_comment, justification)
         
-        activity['responsible_status'][person] = {
-            'status': new_status,
-            'comment': status_comment,
-            'justification': justification if new_status == 'Pendente' else '',
-            'justification_approved': False
-        }
+        activity = activity_store.update_activity(activity, op='status')
+        publish_change('status', activity_id, activity)
         
         # Add to history
         action = f'{person}: Status alterado de "{old_status}" para "{new_status}"'
-        add_to_history(activity, action, current_user, status_comment)
-        
-        save_data(data)
-        flash('Status atualizado com sucesso!')
-        return redirect(url_for('dashboard'))
+        add_to_history(activity_id, action, current_user, status_comment)
+        return dashboard_reply('Status atualizado com sucesso!', activity=activity)
+    except ConflictError:
+        return dashboard_reply(CONFLICT_MESSAGE, 409)
     except Exception as e:
         logging.error(f"Error in quick_update_status: {e}")
-        flash('Erro ao atualizar status.')
-        return redirect(url_for('dashboard'))
+        return dashboard_reply('Erro ao atualizar status.', 500)
+
+@route('/bulk_update_status', methods=['POST'])
+def bulk_update_status():
+    """Update many (activity, person) status cells from the dashboard at once
+
+    Takes JSON {'updates': [{'activity_id', 'person', 'status', 'comment',
+    'justification', 'version'}, ...]}, version being optional. Every update
+    is checked with the same rules as quick_update_status before anything is
+    stored, then the changed activities are committed in a single write:
+    all of them or, on a conflict, none.
+    """
+    current_user = session.get('current_user', 'Washington')
+    people = responsibles.current()
+    payload = request.get_json(silent=True) or {}
+    updates = payload.get('updates') if isinstance(payload, dict) else None
+    if not isinstance(updates, list) or not updates:
+        return api_error('Nenhuma atualização informada.', 400)
+    if len(updates) > MAX_BULK_UPDATES:
+        return api_error(f'No máximo {MAX_BULK_UPDATES} atualizações por vez.', 400)
+    
+    def update_error(message, status, index):
+        return api_response({'error': message, 'index': index}, status)
+    
+    try:
+        activities = {}
+        changes = {}
+        seen = set()
+        for index, update in enumerate(updates):
+            if not isinstance(update, dict):
+                return update_error('Atualização inválida.', 400, index)
+            try:
+                activity_id = int(update.get('activity_id'))
+            except (TypeError, ValueError):
+                return update_error('Atividade inválida.', 400, index)
+            person = update.get('person')
+            
+            if current_user != people.director and current_user != person:
+                return update_error('Você não tem permissão para atualizar este status.', 403, index)
+            if (activity_id, person) in seen:
+                return update_error('A mesma célula aparece mais de uma vez.', 400, index)
+            seen.add((activity_id, person))
+            
+            activity = activities.get(activity_id)
+            if activity is None:
+                activity = activity_store.get_activity(activity_id)
+                if not activity:
+                    return update_error('Atividade não encontrada.', 404, index)
+                # The dashboard sends the version its rows were rendered at
+                if 'version' in update and update['version'] != activity.get('version', 0):
+                    return update_error(CONFLICT_MESSAGE, 409, index)
+                activities[activity_id] = activity
+            if person not in activity['responsible']:
+                return update_error('Pessoa não encontrada na atividade.', 404, index)
+            
+            new_status = update.get('status')
+            status_comment = (update.get('comment') or '').strip()
+            justification = (update.get('justification') or '').strip()
+            error = validate_status_change(new_status, status_comment, justification)
+            if error:
+                return update_error(error, 400, index)
+            
+            old_status = set_person_status(activity, person, new_status, status_comment, justification)
+            actions, comments = changes.setdefault(activity_id, ([], []))
+            actions.append(f'{person}: Status alterado de "{old_status}" para "{new_status}"')
+            if status_comment and status_comment not in comments:
+                comments.append(status_comment)
+        
+        stored = activity_store.update_activities(list(activities.values()), op='status')
+    except ConflictError:
+        return api_error(CONFLICT_MESSAGE, 409)
+    except Exception as e:
+        logging.error(f"Error in bulk_update_status: {e}")
+        return api_error('Erro ao atualizar status.', 500)
+    
+    # One history entry per activity, covering all of its changed cells,
+    # written together like the status changes themselves
+    entries = []
+    for activity in stored:
+        actions, comments = changes[activity['id']]
+        publish_change('status', activity['id'], activity)
+        entries.append((activity['id'], history_entry('; '.join(actions), current_user, '; '.join(comments))))
+    activity_store.append_history_batch(entries)
+    
+    return api_response({
+        'message': f'{len(updates)} status atualizados com sucesso!',
+        'activities': [{
+            'id': activity['id'],
+            'version': activity['version'],
+            'responsible_status': activity['responsible_status'],
+            'overall_status': activity['overall_status']
+        } for activity in stored],
+        'counters': activity_store.status_counts()
+    })
+
+@route('/import_activities', methods=['POST'])
+def import_activities_upload():
+    """Import activities from an uploaded CSV or JSONL file (Director only)"""
+    current_user = session.get('current_user', 'Washington')
+    people = responsibles.current()
+    if current_user != people.director:
+        return dashboard_reply('Apenas o diretor pode importar atividades.', 403, endpoint='index')
+    
+    upload = request.files.get('file')
+    fmt = detect_import_format(upload.filename if upload else None)
+    if fmt is None:
+        return dashboard_reply('Envie um arquivo .csv ou .jsonl.', 400)
+    
+    imports_dir = current_app.config['IMPORTS_DIR']
+    os.makedirs(imports_dir, exist_ok=True)
+    report_name = f"import_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_erros.csv"
+    
+    try:
+        # The upload is read row by row straight from the request stream
+        result = import_activities(activity_store, upload.stream, fmt, people.manager_set, current_user,
+                                   os.path.join(imports_dir, report_name))
+    except UnicodeDecodeError:
+        return dashboard_reply('O arquivo deve estar em UTF-8.', 400)
+    except Exception as e:
+        logging.error(f"Error importing activities: {e}", exc_info=True)
+        return dashboard_reply('Erro ao importar atividades.', 500)
+    if result['imported']:
+        publish_change('import', None)
+    
+    message = f"{result['imported']} atividade(s) importada(s)."
+    report_url = url_for('import_report', filename=report_name) if result['failed'] else None
+    if wants_json():
+        if report_url:
+            message = f"{message} {result['failed']} linha(s) com erro."
+        return api_response({**result, 'message': message, 'report': report_url})
+    if report_url:
+        message = Markup('{} {} linha(s) com erro: <a href="{}">baixar relatório</a>.').format(
+            message, result['failed'], report_url)
+    flash(message)
+    return redirect(url_for('dashboard'))
+
+@route('/import_reports/<path:filename>')
+def import_report(filename):
+    """Download the failure report of an import (Director only)"""
+    current_user = session.get('current_user', 'Washington')
+    people = responsibles.current()
+    if current_user != people.director:
+        flash('Acesso negado.')
+        return redirect(url_for('index'))
+    return send_from_directory(os.path.abspath(current_app.config['IMPORTS_DIR']), filename, as_attachment=True)
+
+@route('/export/<fmt>')
+def export_activities(fmt):
+    """Download the activities visible to the current user as CSV or XLSX
+
+    CSV is streamed while it is produced; ?sheet=status exports one row per
+    responsible instead of one per activity. XLSX holds both sheets and is
+    built in a temporary file first, since a workbook is a zip archive.
+    """
+    current_user = session.get('current_user', 'Aline')
+    people = responsibles.current()
+    sheet = request.args.get('sheet', 'atividades')
+    if fmt not in EXPORT_FORMATS or sheet not in SHEETS:
+        flash('Formato de exportação inválido.')
+        return redirect(url_for('index'))
+    
+    if current_user == people.director:
+        activities = activity_store.list_activities()
+    else:
+        activities = activity_store.list_activities(responsible=current_user)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    if fmt == 'csv':
+        response = current_app.response_class(iter_csv(activities, sheet), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename="{sheet}_{timestamp}.csv"'
+        return response
+    
+    try:
+        # Kept in memory up to a few MB, then spilled to disk
+        workbook = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        write_xlsx(activities, workbook)
+        workbook.seek(0)
+    except RuntimeError as e:
+        logging.error(f"Error exporting activities: {e}")
+        flash('Exportação para Excel indisponível no servidor. Use CSV.')
+        return redirect(url_for('dashboard' if current_user == people.director else 'index'))
+    return send_file(workbook, as_attachment=True, download_name=f'atividades_{timestamp}.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
-@app.route('/edit_activity/<int:activity_id>', methods=['POST'])
+@route('/edit_activity/<int:activity_id>', methods=['POST'])
 def edit_activity(activity_id):
     """Edit activity details"""
     try:
         current_user = session.get('current_user', 'Washington')
+        people = responsibles.current()
         
-        if current_user != DIRECTOR:
+        if current_user != people.director:
             flash('Apenas o diretor pode editar atividades.')
             return redirect(url_for('dashboard'))
         
-        data = load_data()
-        activity = next((act for act in data['activities'] if act['id'] == activity_id), None)
+        activity = activity_store.get_activity(activity_id)
         if not activity:
             flash('Atividade não encontrada.')
             return redirect(url_for('dashboard'))
@@ -520,16 +883,16 @@ def edit_activity(activity_id):
         deadline = request.form.get('deadline', '').strip()
         responsible = request.form.getlist('responsible')
         
-        # Validation
-        if not all([title, description, deadline]) or not responsible:
-            flash('Todos os campos são obrigatórios.')
-            return redirect(url_for('dashboard'))
+        # The edit form carries the version the director was looking at
+        expected_version = request.form.get('version', type=int)
+        if expected_version is not None and expected_version != activity.get('version', 0):
+            raise ConflictError(activity_id, expected_version, activity.get('version', 0))
         
-        # Validate all responsibles
-        for resp in responsible:
-            if resp not in MANAGERS:
-                flash('Responsável inválido.')
-                return redirect(url_for('dashboard'))
+        # Validation (required fields and known responsibles)
+        error = validate_activity_fields(title, description, deadline, responsible, people.manager_set)
+        if error:
+            flash(error)
+            return redirect(url_for('dashboard'))
         
         # Update activity
         old_responsible = activity.get('responsible', [])
@@ -558,37 +921,37 @@ def edit_activity(activity_id):
                 if person not in responsible:
                     activity['responsible_status'].pop(person, None)
         
-        add_to_history(activity, 'Atividade editada', current_user)
-        
-        save_data(data)
+        activity = activity_store.update_activity(activity, op='edit')
+        publish_change('edit', activity_id, activity)
+        add_to_history(activity_id, 'Atividade editada', current_user)
         flash('Atividade atualizada com sucesso!')
         return redirect(url_for('dashboard'))
+    except ConflictError:
+        flash(CONFLICT_MESSAGE)
+        return redirect(url_for('dashboard'))
     except Exception as e:
         logging.error(f"Error editing activity: {e}")
         flash('Erro ao editar atividade.')
         return redirect(url_for('dashboard'))
 
-@app.route('/delete_activity/<int:activity_id>', methods=['POST'])
+@route('/delete_activity/<int:activity_id>', methods=['POST'])
 def delete_activity(activity_id):
     """Delete activity (Director only)"""
     try:
         current_user = session.get('current_user', 'Washington')
+        people = responsibles.current()
         
-        if current_user != DIRECTOR:
+        if current_user != people.director:
             flash('Apenas o diretor pode excluir atividades.')
             return redirect(url_for('index'))
         
         # Get the referrer to redirect back
         referrer = request.referrer or url_for('index')
         
-        data = load_data()
-        activity = next((act for act in data['activities'] if act['id'] == activity_id), None)
-        if not activity:
+        if not activity_store.delete_activity(activity_id):
             flash('Atividade não encontrada.')
             return redirect(referrer)
-        
-        data['activities'] = [act for act in data['activities'] if act['id'] != activity_id]
-        save_data(data)
+        publish_change('delete', activity_id)
         
         flash('Atividade excluída com sucesso!')
         return redirect(referrer)
@@ -597,13 +960,14 @@ def delete_activity(activity_id):
         flash('Erro ao excluir atividade.')
         return redirect(request.referrer or url_for('index'))
 
-@app.route('/manage_responsibles', methods=['GET', 'POST'])
+@route('/manage_responsibles', methods=['GET', 'POST'])
 def manage_responsibles():
     """Manage responsibles (Director only)"""
     try:
         current_user = session.get('current_user', 'Washington')
+        people = responsibles.current()
         
-        if current_user != DIRECTOR:
+        if current_user != people.director:
             flash('Apenas o diretor pode gerenciar responsáveis.')
             return redirect(url_for('index'))
         
@@ -616,18 +980,13 @@ def manage_responsibles():
                     flash('Nome inválido!')
                     return redirect(url_for('manage_responsibles'))
                 
-                responsibles = load_responsibles()
-                
-                if name in responsibles['managers']:
+                if name in people.manager_set:
                     flash(f'{name} já existe na lista de responsáveis!')
                     return redirect(url_for('manage_responsibles'))
                 
-                responsibles['managers'].append(name)
-                responsibles['managers'].sort()
-                save_responsibles(responsibles)
-                
-                # Reload responsibles globally
-                reload_responsibles()
+                # Replaces the snapshot every request sees from now on
+                responsibles.save({'managers': sorted([*people.managers, name]),
+                                   'director': people.director})
                 
                 flash(f'{name} adicionado com sucesso!')
                 return redirect(url_for('manage_responsibles'))
@@ -637,72 +996,301 @@ def manage_responsibles():
                     flash('Nome inválido!')
                     return redirect(url_for('manage_responsibles'))
                 
-                responsibles = load_responsibles()
-                
-                if name not in responsibles['managers']:
+                if name not in people.manager_set:
                     flash(f'{name} não encontrado na lista!')
                     return redirect(url_for('manage_responsibles'))
                 
-                if name == responsibles['director']:
+                if name == people.director:
                     flash('Não é possível remover o diretor!')
                     return redirect(url_for('manage_responsibles'))
                 
                 # Check if has activities
-                data = load_data()
-                has_activities = False
-                
-                for activity in data['activities']:
-                    if isinstance(activity.get('responsible'), list):
-                        if name in activity['responsible']:
-                            has_activities = True
-                            break
-                    elif activity.get('responsible') == name:
-                        has_activities = True
-                        break
-                
-                if has_activities:
+                if activity_store.has_activities(name):
                     flash(f'{name} possui atividades atribuídas e não pode ser removido!')
                     return redirect(url_for('manage_responsibles'))
                 
-                responsibles['managers'].remove(name)
-                save_responsibles(responsibles)
-                
-                # Reload responsibles globally
-                reload_responsibles()
+                responsibles.save({'managers': [manager for manager in people.managers if manager != name],
+                                   'director': people.director})
                 
                 flash(f'{name} removido com sucesso!')
                 return redirect(url_for('manage_responsibles'))
         
         # GET request - show form
-        reload_responsibles()
-        
         # Count activities per responsible
-        data = load_data()
-        activity_counts = {}
-        for manager in MANAGERS:
-            count = 0
-            for activity in data['activities']:
-                if isinstance(activity.get('responsible'), list):
-                    if manager in activity['responsible']:
-                        count += 1
-                elif activity.get('responsible') == manager:
-                    count += 1
-            activity_counts[manager] = count
+        activity_counts = activity_store.count_by_responsible(people.managers)
         
         return render_template('manage_responsibles.html',
                              current_user=current_user,
-                             managers=MANAGERS,
-                             director=DIRECTOR,
+                             managers=people.managers,
+                             director=people.director,
                              activity_counts=activity_counts)
     except Exception as e:
         logging.error(f"Error managing responsibles: {e}")
         flash('Erro ao gerenciar responsáveis.')
         return redirect(url_for('index'))
 
-def save_responsibles(data):
-    """Salva a lista de responsáveis no arquivo"""
-    with open(RESPONSIBLES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+# JSON API
+#
+# Responses are compact JSON and carry an ETag: the activity version for a
+# single activity, the data version of the store for lists. Clients that
+# send If-None-Match get a 304 without the body being built; write requests
+# may send If-Match to make sure they are changing the version they read.
+
+def api_response(data, status=200, etag=None):
+    """Return data as a compact JSON response, tagged with etag if given"""
+    response = current_app.response_class(serialization.dumps(data), status=status,
+                                  mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def api_error(message, status):
+    return api_response({'error': message}, status)
+
+def api_not_modified(etag):
+    """Return a 304 response if the client already has etag, otherwise None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def activity_etag(activity):
+    return f"{activity['id']}-{activity.get('version', 0)}"
+
+def api_commit(activity, op, current_user, history_action, comment=''):
+    """Commit a changed activity for an API request and answer with it"""
+    if request.if_match and not request.if_match.contains(activity_etag(activity)):
+        return api_error('A atividade foi alterada desde a última leitura.', 412)
+    try:
+        activity = activity_store.update_activity(activity, op=op)
+    except ConflictError:
+        return api_error(CONFLICT_MESSAGE, 409)
+    publish_change(op, activity['id'], activity)
+    add_to_history(activity['id'], history_action, current_user, comment)
+    return api_response(activity, etag=activity_etag(activity))
+
+@route('/api/activities', methods=['GET'])
+def api_list_activities():
+    """List activities visible to the current user (filters: responsible, overall_status)"""
+    current_user = session.get('current_user', 'Aline')
+    people = responsibles.current()
+    
+    # Lists differ per user and change with the director, so both are part of the tag
+    key = f'{current_user}|{people.signature}'
+    etag = f'{activity_store.data_version()}-{zlib.crc32(key.encode()):08x}'
+    not_modified = api_not_modified(etag)
+    if not_modified:
+        return not_modified
+    
+    if current_user == people.director:
+        activities = activity_store.list_activities(responsible=request.args.get('responsible'))
+    else:
+        activities = activity_store.list_activities(responsible=current_user)
+        if request.args.get('responsible'):
+            activities = [act for act in activities if request.args['responsible'] in act['responsible']]
+    
+    overall_status = request.args.get('overall_status')
+    if overall_status:
+        activities = [act for act in activities if act['overall_status'] == overall_status]
+    
+    return api_response({'activities': activities}, etag=etag)
+
+@route('/api/activities/<int:activity_id>', methods=['GET'])
+def api_get_activity(activity_id):
+    """Return one activity (without its history)"""
+    current_user = session.get('current_user', 'Aline')
+    people = responsibles.current()
+    activity = activity_store.get_activity(activity_id)
+    if not activity:
+        return api_error('Atividade não encontrada.', 404)
+    if current_user != people.director and current_user not in activity['responsible']:
+        return api_error('Você não tem permissão para visualizar esta atividade.', 403)
+    
+    etag = activity_etag(activity)
+    not_modified = api_not_modified(etag)
+    if not_modified:
+        return not_modified
+    return api_response(activity, etag=etag)
+
+@route('/api/activities', methods=['POST'])
+def api_create_activity():
+    """Create an activity from {title, description, deadline, responsible}"""
+    current_user = session.get('current_user', 'Aline')
+    people = responsibles.current()
+    payload = request.get_json(silent=True) or {}
+    
+    responsible = payload.get('responsible', [])
+    if isinstance(responsible, str):
+        responsible = [responsible]
+    title = str(payload.get('title', '')).strip()
+    description = str(payload.get('description', '')).strip()
+    deadline = str(payload.get('deadline', '')).strip()
+    
+    error = validate_activity_fields(title, description, deadline, responsible, people.manager_set)
+    if error:
+        return api_error(error, 400)
+    
+    activity = activity_store.add_activity(
+        new_activity_record(title, description, deadline, responsible, current_user))
+    publish_change('create', activity['id'], activity)
+    add_to_history(activity['id'], 'Criada', current_user)
+    
+    response = api_response(activity, status=201, etag=activity_etag(activity))
+    response.headers['Location'] = url_for('api_get_activity', activity_id=activity['id'])
+    return response
+
+@route('/api/activities/<int:activity_id>/status/<person>', methods=['POST'])
+def api_update_status(activity_id, person):
+    """Set the status of one responsible from {status, comment, justification}"""
+    current_user = session.get('current_user', 'Washington')
+    people = responsibles.current()
+    activity = activity_store.get_activity(activity_id)
+    if not activity:
+        return api_error('Atividade não encontrada.', 404)
+    if current_user != people.director and current_user != person:
+        return api_error('Você não tem permissão para atualizar este status.', 403)
+    if person not in activity['responsible']:
+        return api_error('Pessoa não encontrada na atividade.', 404)
+    
+    payload = request.get_json(silent=True) or {}
+    new_status = payload.get('status')
+    status_comment = str(payload.get('comment', '')).strip()
+    justification = str(payload.get('justification', '')).strip()
+    
+    error = validate_status_change(new_status, status_comment, justification)
+    if error:
+        return api_error(error, 400)
+    
+    old_status = set_person_status(activity, person, new_status, status_comment, justification)
+    action = f'{person}: Status alterado de "{old_status}" para "{new_status}"'
+    return api_commit(activity, 'status', current_user, action, status_comment)
+
+@route('/api/activities/<int:activity_id>/justification/<person>', methods=['POST'])
+def api_decide_justification(activity_id, person):
+    """Approve or reject a justification from {action: approve|reject, comment}"""
+    current_user = session.get('current_user', 'Washington')
+    people = responsibles.current()
+    if current_user != people.director:
+        return api_error('Apenas o diretor pode aprovar justificativas.', 403)
+    
+    activity = activity_store.get_activity(activity_id)
+    if not activity:
+        return api_error('Atividade não encontrada.', 404)
+    if person not in activity['responsible_status']:
+        return api_error('Pessoa não encontrada na atividade.', 404)
+    
+    payload = request.get_json(silent=True) or {}
+    action = payload.get('action')
+    director_comment = str(payload.get('comment', '')).strip()
+    if action not in ('approve', 'reject'):
+        return api_error('Ação inválida.', 400)
+    
+    decide_justification(activity, person, action == 'approve')
+    decision = 'aprovada' if action == 'approve' else 'rejeitada'
+    return api_commit(activity, action, current_user,
+                      f'Justificativa de {person} {decision}', director_comment)
+
+def data_gauges():
+    """Sizes of the data files and the number of activities, read at scrape time"""
+    config = current_app.config
+    files = {'responsibles': config['RESPONSIBLES_FILE'], 'events': config['EVENTS_FILE']}
+    if config['STORAGE_BACKEND'] == 'sqlite':
+        files.update(database=config['SQLITE_FILE'], wal=f"{config['SQLITE_FILE']}-wal")
+    else:
+        files.update(activities=config['ACTIVITIES_FILE'], journal=activity_store.journal_path)
+    gauges = []
+    for name, path in files.items():
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        gauges.append(('data_file_size_bytes', 'Size of the data files', {'file': name}, size))
+    gauges.append(('activities', 'Activities in the store', {}, activity_store.status_counts()['total']))
+    return gauges
+
+@route('/metrics', endpoint='metrics')
+def metrics_endpoint():
+    """Prometheus metrics of all worker processes (text exposition format)
+
+    Measuring starts with the first scrape and stops when nobody has scraped
+    for a while (metrics.ACTIVE_WINDOW), so the first scrape has no latencies.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return current_app.response_class('Acesso negado\n', status=403, mimetype='text/plain')
+    body = metrics.REGISTRY.render(data_gauges())
+    response = current_app.response_class(body, mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def default_config():
+    """Settings taken from the environment, overridable through create_app(config)"""
+    return {
+        'SECRET_KEY': os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production"),
+        'DATA_DIR': DATA_DIR,
+        'ACTIVITIES_FILE': ACTIVITIES_FILE,
+        # Storage backend: 'json' (ACTIVITIES_FILE) or 'sqlite' (SQLITE_FILE)
+        'STORAGE_BACKEND': os.environ.get('STORAGE_BACKEND', 'json'),
+        'SQLITE_FILE': os.environ.get('SQLITE_FILE', SQLITE_FILE),
+        # Snapshot format of the JSON backend: 'json', 'json-indent' or 'msgpack'
+        'DATA_FORMAT': os.environ.get('DATA_FORMAT', 'json'),
+        'RESPONSIBLES_FILE': RESPONSIBLES_FILE,
+        'IMPORTS_DIR': IMPORTS_DIR,
+        'EVENTS_FILE': EVENTS_FILE,
+        'METRICS_DIR': METRICS_DIR,
+        # When set, /metrics requires 'Authorization: Bearer <token>'
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+        'FRAGMENT_CACHE_SIZE': int(os.environ.get('FRAGMENT_CACHE_SIZE', 16 * 1024 * 1024)),
+        # Open /events streams per process; keep it well below the server
+        # threads per process (THREADS), which ordinary requests need too
+        'MAX_EVENT_STREAMS': int(os.environ.get('MAX_EVENT_STREAMS',
+                                                max(int(os.environ.get('THREADS', 8)) // 2, 1))),
+        # Requests slower than this are logged as warnings
+        'SLOW_REQUEST_MS': int(os.environ.get('LOG_SLOW_REQUEST_MS', 1000)),
+    }
+
+def create_app(config=None):
+    """Build the Flask app
+
+    config overrides keys of default_config(). Nothing is read or written
+    until a request needs it (see AppServices), so importing this module
+    and creating an app is cheap for workers and scripts alike.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.from_mapping(config)
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+    app.extensions['activities'] = AppServices(app.config)
+    app.before_request(start_request_timer)
+    app.after_request(log_request)
+    app.after_request(record_request_metrics)
+    before_render_template.connect(start_template_timer, app)
+    template_rendered.connect(record_template_render, app)
+    for rule, view_func, options in _routes:
+        app.add_url_rule(rule, view_func=view_func, **options)
+    return app
+
+def preload(app):
+    """Load the data and compile the templates once, before forking workers
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    Meant for a server that imports the app in its master process and then
+    forks (gunicorn --preload): every worker starts with the store, its
+    indexes, the responsibles and the templates already in memory and shares
+    those pages with the master copy-on-write instead of loading its own.
+    """
+    app_services = app.extensions['activities']
+    with app.app_context():
+        app_services.activity_store.status_counts()
+        app_services.responsibles.current()
+        app_services.code_version(app)
+        for name in app.jinja_env.list_templates(extensions=['html']):
+            app.jinja_env.get_template(name)
+    # Objects loaded so far live as long as the workers; keeping the garbage
+    # collector off them keeps their pages shared
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import serialization
+
+try:
+    import fcntl
+except ImportError:  # Windows: publishers are only serialized within one process
+    fcntl = None
+
+# Size at which the events file is rotated (the previous one is kept as .1)
+EVENTS_MAX_SIZE = 1024 * 1024
+
+
+class EventLog:
+    """Change events shared by every worker process through an append-only file.
+
+    Write paths publish one JSON line per change. Each open page follows the
+    file from its own position through a Server-Sent Events stream, so an
+    event published by any worker reaches the pages connected to all of
+    them. An event id is '<inode>-<offset after the event>', which lets a
+    reconnecting browser (Last-Event-ID) resume exactly where it stopped.
+
+    When the file grows past max_size it is renamed to <path>.1 and a new
+    one is started; followers drain the old file before switching. A client
+    whose position is no longer available gets a 'reset' event and reloads.
+    """
+
+    def __init__(self, path, max_size=EVENTS_MAX_SIZE, poll_interval=0.5, keepalive=15):
+        self.path = path
+        self.rotated_path = f'{path}.1'
+        self.lock_path = f'{path}.lock'
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.keepalive = keepalive
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _publish_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def publish(self, event_type, data):
+        """Append one event for every follower"""
+        line = serialization.dumps({'type': event_type, 'data': data}, 'json') + b'\n'
+        with self._publish_lock():
+            try:
+                if os.path.getsize(self.path) >= self.max_size:
+                    os.replace(self.path, self.rotated_path)
+            except FileNotFoundError:
+                pass
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+    def _open(self, path):
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None, None
+        return f, os.fstat(f.fileno()).st_ino
+
+    def _start(self, last_event_id):
+        """Return (file, inode, offset, reset) for a new follower"""
+        f, ino = self._open(self.path)
+        if not last_event_id:
+            offset = os.fstat(f.fileno()).st_size if f else 0
+            return f, ino, offset, False
+
+        try:
+            last_ino, offset = (int(part) for part in last_event_id.split('-'))
+        except ValueError:
+            last_ino, offset = None, 0
+
+        if f is not None and ino == last_ino and offset <= os.fstat(f.fileno()).st_size:
+            return f, ino, offset, False
+
+        # The client may still be reading the file that was rotated away
+        old, old_ino = self._open(self.rotated_path)
+        if old is not None and old_ino == last_ino and offset <= os.fstat(old.fileno()).st_size:
+            if f is not None:
+                f.close()
+            return old, old_ino, offset, False
+        if old is not None:
+            old.close()
+
+        # Events were missed: the client has to start over from a fresh page
+        offset = os.fstat(f.fileno()).st_size if f else 0
+        return f, ino, offset, True
+
+    def stream(self, last_event_id=None, visible=None):
+        """Yield Server-Sent Events messages for events published after last_event_id
+
+        visible(event_type, data) returns the data the follower may see, or
+        None to skip the event (it still moves the stream position).
+        """
+        f, ino, offset, reset = self._start(last_event_id)
+        try:
+            yield 'retry: 3000\n\n'
+            if reset:
+                yield 'event: reset\ndata: {}\n\n'
+
+            pending = b''
+            idle_since = time.monotonic()
+            while True:
+                chunk = b''
+                if f is not None:
+                    f.seek(offset + len(pending))
+                    chunk = f.read()
+                if chunk:
+                    pending += chunk
+                    # Only complete lines are events; the rest is still being written
+                    end = pending.rfind(b'\n') + 1
+                    for line in pending[:end].splitlines(keepends=True):
+                        offset += len(line)
+                        try:
+                            event = serialization.loads(line)
+                        except serialization.DecodeError:
+                            continue
+                        data = event['data']
+                        if visible is not None:
+                            data = visible(event['type'], data)
+                            if data is None:
+                                continue
+                        data = serialization.dumps(data, 'json').decode('utf-8')
+                        yield f"id: {ino}-{offset}\nevent: {event['type']}\ndata: {data}\n\n"
+                    pending = pending[end:]
+                    idle_since = time.monotonic()
+                    continue
+
+                # Follow the file to its replacement once it has been rotated
+                try:
+                    current_ino = os.stat(self.path).st_ino
+                except FileNotFoundError:
+                    current_ino = None
+                if current_ino is not None and current_ino != ino:
+                    if f is not None:
+                        f.close()
+                    f, ino = self._open(self.path)
+                    offset, pending = 0, b''
+                    continue
+
+                if time.monotonic() - idle_since >= self.keepalive:
+                    # Comments keep proxies from closing the connection and
+                    # let the server notice clients that went away
+                    yield ': keepalive\n\n'
+                    idle_since = time.monotonic()
+                time.sleep(self.poll_interval)
+        except GeneratorExit:
+            pass
+        except Exception as e:
+            logging.error(f"Error streaming events: {e}")
+        finally:
+            if f is not None:
+                f.close()
@@ -0,0 +1,135 @@
+import io
+import csv
+import itertools
+from datetime import datetime
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+except ImportError:  # Optional: only needed for XLSX exports
+    openpyxl = None
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+ACTIVITY_COLUMNS = ['ID', 'Título', 'Descrição', 'Responsáveis', 'Status Geral', 'Prazo',
+                    'Criado por', 'Data de Criação']
+STATUS_COLUMNS = ['ID', 'Título', 'Responsável', 'Status', 'Comentário', 'Justificativa',
+                  'Justificativa Aprovada']
+
+# Rows looked at to size the XLSX columns, and the widest a column gets
+WIDTH_SAMPLE_ROWS = 200
+MAX_COLUMN_WIDTH = 50
+
+# CSV text is handed out in chunks of about this many characters
+CSV_CHUNK_SIZE = 64 * 1024
+
+
+def format_date(value, source_format, target_format):
+    try:
+        return datetime.strptime(value, source_format).strftime(target_format)
+    except (TypeError, ValueError):
+        return value or ''
+
+
+def format_datetime(value):
+    try:
+        return datetime.fromisoformat(value).strftime('%d/%m/%Y %H:%M')
+    except (TypeError, ValueError):
+        return value or ''
+
+
+def activity_rows(activities):
+    """Yield one row per activity (ACTIVITY_COLUMNS)"""
+    for activity in activities:
+        yield [
+            activity.get('id', ''),
+            activity.get('title', ''),
+            activity.get('description', ''),
+            ', '.join(activity.get('responsible', [])),
+            activity.get('overall_status', ''),
+            format_date(activity.get('deadline'), '%Y-%m-%d', '%d/%m/%Y'),
+            activity.get('created_by', ''),
+            format_datetime(activity.get('created_at'))
+        ]
+
+
+def status_rows(activities):
+    """Yield one row per (activity, responsible) with that person's status (STATUS_COLUMNS)"""
+    for activity in activities:
+        for person, info in activity.get('responsible_status', {}).items():
+            yield [
+                activity.get('id', ''),
+                activity.get('title', ''),
+                person,
+                info.get('status', 'Pendente'),
+                info.get('comment', ''),
+                info.get('justification', ''),
+                'Sim' if info.get('justification_approved') else 'Não'
+            ]
+
+
+# Sheet name -> (columns, row generator)
+SHEETS = {
+    'atividades': (ACTIVITY_COLUMNS, activity_rows),
+    'status': (STATUS_COLUMNS, status_rows)
+}
+
+
+def iter_csv(activities, sheet='atividades'):
+    """Yield a CSV export of one sheet as UTF-8 bytes, a chunk at a time
+
+    Uses ';' and a BOM so that Excel opens it with the accents intact.
+    """
+    columns, rows = SHEETS[sheet]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for row in rows(activities):
+        writer.writerow(row)
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(activities, fileobj):
+    """Write both sheets to fileobj as an XLSX workbook
+
+    The workbook is in openpyxl's write-only mode, so rows go to disk as
+    they are produced instead of being kept as cell objects. activities is
+    iterated once per sheet. Column widths come from the first
+    WIDTH_SAMPLE_ROWS rows of each sheet.
+    """
+    if openpyxl is None:
+        raise RuntimeError('XLSX exports require the openpyxl package (pip install openpyxl)')
+
+    workbook = openpyxl.Workbook(write_only=True)
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color='2F75B5', end_color='2F75B5', fill_type='solid')
+
+    for title, (columns, rows) in SHEETS.items():
+        worksheet = workbook.create_sheet(title.capitalize())
+        rows = rows(activities)
+        sample = list(itertools.islice(rows, WIDTH_SAMPLE_ROWS))
+
+        # Widths have to be set before the first row is written
+        for index, column in enumerate(columns):
+            longest = max([len(column)] + [len(str(row[index])) for row in sample if row[index]])
+            worksheet.column_dimensions[get_column_letter(index + 1)].width = min(longest + 2, MAX_COLUMN_WIDTH)
+
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=column)
+            cell.font = header_font
+            cell.fill = header_fill
+            header.append(cell)
+        worksheet.append(header)
+
+        for row in itertools.chain(sample, rows):
+            worksheet.append(row)
+
+    workbook.save(fileobj)
@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    """LRU cache of rendered HTML fragments with a size cap.
+
+    Keys are expected to change whenever the fragment would render
+    differently (for example by including the activity version), so entries
+    are never invalidated, only evicted once the cached markup exceeds
+    max_size characters.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_or_render(self, key, render):
+        """Return the fragment cached under key, calling render() on a miss"""
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+                return fragment
+        fragment = render()
+        self.put(key, fragment)
+        return fragment
+
+    def put(self, key, fragment):
+        """Cache a fragment, evicting the least recently used ones over the cap"""
+        size = len(fragment)
+        if size > self.max_size:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = fragment
+            self._size += size
+            while self._size > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
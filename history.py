@@ -0,0 +1,92 @@
+import os
+import json
+
+# Files append_batch() keeps open at once (each stays open until it is fsynced)
+BATCH_OPEN_FILES = 256
+
+
+class HistoryStore:
+    """Append-only activity history, one JSON-lines file per activity.
+
+    History is only needed by the activity detail page, so it is kept out of
+    the activity records: list pages and the dashboard never read it, and a
+    status change appends one line instead of rewriting the whole history.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, activity_id):
+        return os.path.join(self.directory, f'{int(activity_id)}.jsonl')
+
+    def append(self, activity_id, entry):
+        """Append one history entry for an activity"""
+        os.makedirs(self.directory, exist_ok=True)
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        fd = os.open(self._path(activity_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def append_batch(self, entries):
+        """Append entries [(activity_id, entry), ...] to their histories
+
+        Entries are grouped by activity, so each file is opened and written
+        once, and nothing is fsynced until the whole group has been written:
+        the first fsync then commits the group to disk and the following
+        ones find little left to flush, instead of one disk flush per entry.
+        """
+        lines = {}
+        for activity_id, entry in entries:
+            lines.setdefault(int(activity_id), []).append(json.dumps(entry, ensure_ascii=False) + '\n')
+        if not lines:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        items = list(lines.items())
+        for start in range(0, len(items), BATCH_OPEN_FILES):
+            fds = []
+            try:
+                for activity_id, activity_lines in items[start:start + BATCH_OPEN_FILES]:
+                    fd = os.open(self._path(activity_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    fds.append(fd)
+                    os.write(fd, ''.join(activity_lines).encode('utf-8'))
+                for fd in fds:
+                    os.fsync(fd)
+            finally:
+                for fd in fds:
+                    os.close(fd)
+
+    def replace(self, activity_id, entries):
+        """Overwrite the history of an activity (used when migrating old records)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(activity_id)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, path)
+
+    def read_all(self, activity_id):
+        """Return every entry of an activity, oldest first"""
+        try:
+            with open(self._path(activity_id), 'r', encoding='utf-8') as f:
+                # A line without its newline is an append still in progress
+                return [json.loads(line) for line in f if line.endswith('\n') and line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def read(self, activity_id, offset=0, limit=None):
+        """Return (entries newest first, total count) for one page of history"""
+        entries = self.read_all(activity_id)
+        entries.reverse()
+        end = None if limit is None else offset + limit
+        return entries[offset:end], len(entries)
+
+    def delete(self, activity_id):
+        """Remove the history of a deleted activity"""
+        try:
+            os.remove(self._path(activity_id))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,175 @@
+import io
+import csv
+import json
+import itertools
+from datetime import datetime
+
+from storage import validate_activity_fields, new_activity_record
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+
+# New activities committed per write (one journal record / one transaction)
+IMPORT_BATCH_SIZE = 500
+
+# Accepted deadline formats: the one the forms send and the one exports are written in
+DEADLINE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+
+# Columns of the failure report, besides the original fields of the row
+REPORT_FIELDS = ['linha', 'erro', 'title', 'description', 'deadline', 'responsible']
+
+
+def detect_import_format(filename):
+    """Return 'csv' or 'jsonl' from a file name, or None if it is neither"""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row, error) for each record of a binary stream
+
+    Rows are read one at a time, so the size of the file does not matter.
+    CSV files need a header with title, description, deadline and
+    responsible; ',' and ';' separators are both accepted. JSONL files hold
+    one JSON object per line. error is a message for lines that could not be
+    parsed, in which case row is whatever could be recovered.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        header = text.readline()
+        delimiter = ';' if header.count(';') > header.count(',') else ','
+        reader = csv.DictReader(itertools.chain([header], text), delimiter=delimiter)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, {}, 'JSON inválido.'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, {}, 'A linha deve ser um objeto JSON.'
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unknown import format: {fmt}')
+
+
+def parse_deadline(value):
+    """Return a deadline in one of DEADLINE_FORMATS as YYYY-MM-DD, or None if it is invalid"""
+    for deadline_format in DEADLINE_FORMATS:
+        try:
+            return datetime.strptime(value, deadline_format).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+def parse_row(row, managers, created_by):
+    """Return (new activity record, None) for a valid row, or (None, error message)
+
+    Uses the same rules as the add activity form; responsible is a list in
+    JSONL and a ',' or ';' separated string in CSV. The deadline may be
+    YYYY-MM-DD or DD/MM/YYYY (as exports write it) and is stored as the former.
+    """
+    title = str(row.get('title') or '').strip()
+    description = str(row.get('description') or '').strip()
+    deadline = str(row.get('deadline') or '').strip()
+    responsible = row.get('responsible') or []
+    if isinstance(responsible, str):
+        responsible = responsible.replace(';', ',').split(',')
+    responsible = [str(person).strip() for person in responsible if str(person).strip()]
+
+    error = validate_activity_fields(title, description, deadline, responsible, managers)
+    if error:
+        return None, error
+    deadline = parse_deadline(deadline)
+    if deadline is None:
+        return None, 'Prazo inválido (use AAAA-MM-DD ou DD/MM/AAAA).'
+    # Keep the order, drop repeated names
+    responsible = list(dict.fromkeys(responsible))
+    return new_activity_record(title, description, deadline, responsible, created_by), None
+
+
+class ImportReport:
+    """CSV file listing the rows that could not be imported (created on the first one)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.failed = 0
+        self._file = None
+        self._writer = None
+
+    def add(self, line_number, error, row):
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8-sig', newline='')
+            self._writer = csv.DictWriter(self._file, REPORT_FIELDS, extrasaction='ignore')
+            self._writer.writeheader()
+        responsible = row.get('responsible', '')
+        if isinstance(responsible, list):
+            responsible = ', '.join(str(person) for person in responsible)
+        self._writer.writerow({**row, 'linha': line_number, 'erro': error, 'responsible': responsible})
+        self.failed += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def import_activities(store, stream, fmt, managers, created_by, report_path,
+                      batch_size=IMPORT_BATCH_SIZE, on_batch=None):
+    """Stream activities from a CSV or JSONL file into the store
+
+    Valid rows are committed every batch_size rows with one write each, and
+    get the same 'Criada' history entry as activities created in the app.
+    Invalid rows are written to a CSV report at report_path. on_batch, if
+    given, is called with the stored records of each batch.
+
+    Returns {'imported': n, 'failed': n, 'report': report_path or None}.
+    Batches committed before an error stay committed.
+    """
+    report = ImportReport(report_path)
+    imported = 0
+    batch = []
+
+    def commit():
+        nonlocal imported
+        stored = store.add_activities(batch)
+        timestamp = datetime.now().isoformat()
+        store.append_history_batch([
+            (activity['id'], {'timestamp': timestamp, 'action': 'Criada',
+                              'user': created_by, 'comment': 'Importada'})
+            for activity in stored
+        ])
+        imported += len(stored)
+        batch.clear()
+        if on_batch is not None:
+            on_batch(stored)
+
+    try:
+        for line_number, row, error in read_rows(stream, fmt):
+            activity = None
+            if error is None:
+                activity, error = parse_row(row, managers, created_by)
+            if error:
+                report.add(line_number, error, row)
+                continue
+            batch.append(activity)
+            if len(batch) >= batch_size:
+                commit()
+        if batch:
+            commit()
+    finally:
+        report.close()
+
+    return {
+        'imported': imported,
+        'failed': report.failed,
+        'report': report_path if report.failed else None
+    }
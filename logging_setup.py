@@ -0,0 +1,191 @@
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import itertools
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import has_request_context, request, session
+
+# Fields copied from a record into its JSON line when they are set
+CONTEXT_FIELDS = ('route', 'method', 'status', 'activity_id', 'user', 'duration_ms')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and context fields"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Plain lines for a terminal, with the context fields appended"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        context = ' '.join(f'{field}={getattr(record, field)}' for field in CONTEXT_FIELDS
+                           if getattr(record, field, None) is not None)
+        return f'{line} [{context}]' if context else line
+
+
+def request_context():
+    """Route, user and activity of the request being handled, if any"""
+    if not has_request_context():
+        return {}
+    return {
+        'route': request.url_rule.rule if request.url_rule else request.path,
+        'method': request.method,
+        'user': session.get('current_user'),
+        'activity_id': (request.view_args or {}).get('activity_id'),
+    }
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the fields of the current request to records logged while handling it"""
+
+    def filter(self, record):
+        for field, value in request_context().items():
+            if not hasattr(record, field):
+                setattr(record, field, value)
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keep 1 in every `rate` DEBUG records of each call site
+
+    The first record of a call site always passes, so rare debug events
+    are never lost; records of other levels are not sampled.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._counters = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate <= 1:
+            return True
+        key = (record.pathname, record.lineno)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % self.rate == 0
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stock prepare() formats the whole record (traceback included) on the
+    logging thread so it can be pickled; records here never leave the
+    process, so only the message arguments are merged.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+_listener = None
+_handler = None
+_listener_lock = threading.Lock()
+
+
+def _start_listener(output):
+    global _listener
+    _handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork(): a worker forked from a
+    # master that already logs gets a queue and a thread of its own
+    if _listener is not None:
+        _start_listener(_listener.handlers[0])
+
+
+def stop_logging():
+    """Write out the queued records and stop the listener thread"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def parse_levels(spec):
+    """Parse 'werkzeug=WARNING,storage=DEBUG' into {logger: level}"""
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, fmt=None, levels=None, debug_sample=None):
+    """Send all logging through a queue to a background thread writing to stderr
+
+    Records are only put on a queue by the thread that logs them; a
+    listener thread formats them (JSON or text) and writes them. Records
+    logged during a request carry its route, method, user and activity_id.
+    Settings not given come from the environment:
+
+    - LOG_LEVEL: root level (default INFO)
+    - LOG_FORMAT: 'json' (default) or 'text'
+    - LOG_LEVELS: per-logger levels, e.g. 'werkzeug=WARNING,storage=DEBUG'
+    - LOG_DEBUG_SAMPLE: keep 1 in N debug records per call site (default 10)
+    """
+    global _handler
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.environ.get('LOG_FORMAT', 'json')
+    if levels is None:
+        levels = parse_levels(os.environ.get('LOG_LEVELS'))
+    if debug_sample is None:
+        debug_sample = int(os.environ.get('LOG_DEBUG_SAMPLE', 10))
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+        _handler = BackgroundQueueHandler(queue.SimpleQueue())
+        # Sampled-out records are dropped before the request fields are looked up
+        _handler.addFilter(DebugSampler(debug_sample))
+        _handler.addFilter(RequestContextFilter())
+        _start_listener(output)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+
+if hasattr(os, 'register_at_fork'):  # not on Windows, which does not fork
+    os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(stop_logging)
@@ -1,4 +1,24 @@
-from app import app
+import os
+
+from app import create_app, preload
+from logging_setup import configure_logging
+
+
+def load_app():
+    """Configure logging and build the app served as `main:app`"""
+    configure_logging()
+    app = create_app()
+    # With `gunicorn --preload main:app` this module is imported once by the master;
+    # PRELOAD_DATA=1 loads the data there so that forked workers share it
+    if os.environ.get('PRELOAD_DATA') == '1':
+        preload(app)
+    return app
+
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Production server; `python serve.py --dev` runs the Flask debug server.
+    # The server builds (and preloads) the app itself, so none is built here
+    from serve import main
+    main()
+else:
+    app = load_app()
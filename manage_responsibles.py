@@ -1,40 +1,21 @@
 
 import os
-import json
 from datetime import datetime
+from storage import open_store
+from responsibles import ResponsiblesRegistry
 
 ACTIVITIES_FILE = 'data/activities.json'
 RESPONSIBLES_FILE = 'data/responsibles.json'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+SQLITE_FILE = os.environ.get('SQLITE_FILE', 'data/activities.db')
+DATA_FORMAT = os.environ.get('DATA_FORMAT', 'json')
 
-def load_data():
-    """Carrega os dados das atividades"""
-    try:
-        with open(ACTIVITIES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"activities": [], "next_id": 1}
+# Same registry the web app uses, so both see and write the file the same way
+responsibles = ResponsiblesRegistry(RESPONSIBLES_FILE)
 
-def save_data(data):
-    """Salva os dados das atividades"""
-    with open(ACTIVITIES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def load_responsibles():
-    """Carrega a lista de responsáveis"""
-    try:
-        with open(RESPONSIBLES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Lista padrão inicial
-        return {
-            "managers": ['Aline', 'Fábio', 'Marcos', 'Waldir', 'Mario', 'Washington', 'Wollinger'],
-            "director": "Washington"
-        }
-
-def save_responsibles(data):
-    """Salva a lista de responsáveis"""
-    with open(RESPONSIBLES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def get_store():
+    """Abre o armazenamento de atividades configurado (JSON ou SQLite)"""
+    return open_store(STORAGE_BACKEND, ACTIVITIES_FILE, SQLITE_FILE, DATA_FORMAT)
 
 def add_responsible(name):
     """Adiciona um novo responsável"""
@@ -43,66 +24,52 @@ def add_responsible(name):
         return False
     
     name = name.strip()
-    responsibles = load_responsibles()
+    people = responsibles.current()
     
-    if name in responsibles['managers']:
+    if name in people.manager_set:
         print(f"⚠️  {name} já existe na lista de responsáveis!")
         return False
     
-    responsibles['managers'].append(name)
-    responsibles['managers'].sort()
-    save_responsibles(responsibles)
+    responsibles.save({'managers': sorted([*people.managers, name]), 'director': people.director})
     
     print(f"✅ {name} adicionado com sucesso!")
     return True
 
 def remove_responsible(name):
     """Remove um responsável (apenas se não tiver atividades)"""
-    responsibles = load_responsibles()
+    people = responsibles.current()
     
-    if name not in responsibles['managers']:
+    if name not in people.manager_set:
         print(f"❌ {name} não encontrado na lista!")
         return False
     
-    if name == responsibles['director']:
+    if name == people.director:
         print(f"❌ Não é possível remover o diretor!")
         return False
     
     # Verificar se tem atividades
-    data = load_data()
-    has_activities = False
-    
-    for activity in data['activities']:
-        if isinstance(activity.get('responsible'), list):
-            if name in activity['responsible']:
-                has_activities = True
-                break
-        elif activity.get('responsible') == name:
-            has_activities = True
-            break
-    
-    if has_activities:
+    if get_store().has_activities(name):
         print(f"⚠️  {name} possui atividades atribuídas e não pode ser removido!")
         print("   Primeiro, reatribua as atividades para outro responsável.")
         return False
     
-    responsibles['managers'].remove(name)
-    save_responsibles(responsibles)
+    responsibles.save({'managers': [manager for manager in people.managers if manager != name],
+                       'director': people.director})
     
     print(f"✅ {name} removido com sucesso!")
     return True
 
 def list_responsibles():
     """Lista todos os responsáveis"""
-    responsibles = load_responsibles()
+    people = responsibles.current()
     
     print("\n" + "="*50)
     print("📋 LISTA DE RESPONSÁVEIS")
     print("="*50)
-    print(f"👑 Diretor: {responsibles['director']}")
+    print(f"👑 Diretor: {people.director}")
     print("\n👥 Gestores:")
-    for i, manager in enumerate(responsibles['managers'], 1):
-        marker = "👑" if manager == responsibles['director'] else "  "
+    for i, manager in enumerate(people.managers, 1):
+        marker = "👑" if manager == people.director else "  "
         print(f"{marker} {i}. {manager}")
     print("="*50)
 
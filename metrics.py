@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import atexit
+import threading
+import functools
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots of finished workers may be folded twice
+    fcntl = None
+
+# Seconds after the last scrape during which measurements are collected
+ACTIVE_WINDOW = 600
+# How often each worker writes its values for the others to merge
+FLUSH_INTERVAL = 10
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DATA_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+FAST_BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.0001, 0.001)
+
+
+class MetricsRegistry:
+    """Counters and histograms of this process, plus the snapshots of the others
+
+    Nothing is measured until a scrape turns collection on (enabled), so an
+    instrumented call costs one attribute check when nobody is scraping.
+    Each process writes its values to <directory>/<pid>.json every
+    FLUSH_INTERVAL seconds while enabled; collect() adds up the files of
+    all workers, and folds those of finished workers into finished.json so
+    counters never go backwards.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self._metrics = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def update(self, key, buckets, value):
+        with self._lock:
+            if buckets is None:
+                self._values[key] = self._values.get(key, 0) + value
+                return
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (not cumulative), then sum and count
+                entry = self._values[key] = [0] * (len(buckets) + 3)
+            index = 0
+            while index < len(buckets) and value > buckets[index]:
+                index += 1
+            entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    # Sharing between worker processes
+
+    def start(self, directory):
+        """Start the flush thread of this process (again after a fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.directory = directory
+            self._pid = os.getpid()
+            self._values = {}
+            self.enabled = self._recently_scraped()
+            threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _marker(self):
+        return os.path.join(self.directory, 'last_scrape')
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def _recently_scraped(self):
+        try:
+            return time.time() - os.stat(self._marker()).st_mtime < ACTIVE_WINDOW
+        except FileNotFoundError:
+            return False
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.enabled = self._recently_scraped()
+                if self.enabled:
+                    self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        """Write the values of this process for the other workers"""
+        if self.directory is None or not self._values:
+            return
+        with self._lock:
+            values = [[name, list(labels), value] for (name, labels), value in self._values.items()]
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(values, f)
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """Return {(name, labels): value} summed over every worker, and turn collection on"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._marker(), 'a'):
+            os.utime(self._marker())
+        self.enabled = True
+        self.flush()
+
+        with open(os.path.join(self.directory, 'collect.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            finished_path = os.path.join(self.directory, 'finished.json')
+            finished = self._read(finished_path)
+            folded = False
+            totals = {}
+            for name in os.listdir(self.directory):
+                pid, ext = os.path.splitext(name)
+                if ext != '.json' or not pid.isdigit():
+                    continue
+                values = self._read(os.path.join(self.directory, name))
+                if not _alive(int(pid)):
+                    _merge(finished, values)
+                    os.remove(os.path.join(self.directory, name))
+                    folded = True
+                else:
+                    _merge(totals, values)
+            if folded:
+                tmp_path = f'{finished_path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump([[name, list(labels), value] for (name, labels), value in finished.items()], f)
+                os.replace(tmp_path, finished_path)
+        _merge(totals, finished)
+        # The values of this process are fresher than its snapshot file
+        with self._lock:
+            own = self._read(self._snapshot_path(os.getpid()))
+            _merge(totals, {key: _negate(value) for key, value in own.items()})
+            _merge(totals, dict(self._values))
+        return totals
+
+    def _read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return {(name, tuple(labels)): value for name, labels, value in json.load(f)}
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    # Prometheus text format
+
+    def render(self, gauges=()):
+        """Return every metric in the Prometheus text exposition format
+
+        gauges are (name, help, {labels}, value) read by the caller at scrape
+        time, such as file sizes; they describe the data, not a process, so
+        they are not added up across workers.
+        """
+        totals = self.collect()
+        lines = []
+        for metric in self._metrics.values():
+            series = sorted((labels, value) for (name, labels), value in totals.items() if name == metric.name)
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for labels, value in series:
+                lines.extend(metric.render(labels, value))
+        described = set()
+        for name, help, labels, value in gauges:
+            if name not in described:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} gauge')
+                described.add(name)
+            lines.append(f'{name}{_labels(labels.keys(), labels.values())} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        REGISTRY.register(self)
+
+    def inc(self, amount=1, *labels):
+        if REGISTRY.enabled:
+            REGISTRY.update((self.name, labels), None, amount)
+
+    def render(self, labels, value):
+        return [f'{self.name}{_labels(self.labels, labels)} {_number(value)}']
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        REGISTRY.register(self)
+
+    def observe(self, value, *labels):
+        if REGISTRY.enabled:
+            REGISTRY.update((self.name, labels), self.buckets, value)
+
+    def time(self, *labels):
+        """Context manager observing the time spent in its block"""
+        return _Timer(self, labels) if REGISTRY.enabled else _NULL_TIMER
+
+    def render(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), value):
+            cumulative += count
+            le = bound if bound == '+Inf' else _number(bound)
+            lines.append(f'{self.name}_bucket{_labels((*self.labels, "le"), (*labels, le))} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.labels, labels)} {_number(value[-2])}')
+        lines.append(f'{self.name}_count{_labels(self.labels, labels)} {value[-1]}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class _NullTimer:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(histogram, *labels):
+    """Decorator observing the duration of every call in histogram"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+        return wrapper
+    return decorator
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(totals, values):
+    for key, value in values.items():
+        current = totals.get(key)
+        if current is None:
+            totals[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            totals[key] = [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = current + value
+
+
+def _negate(value):
+    return [-v for v in value] if isinstance(value, list) else -value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f'{{{pairs}}}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+@atexit.register
+def _flush_at_exit():
+    # A worker recycled by the server keeps what it measured since its last flush
+    if REGISTRY.enabled and REGISTRY._pid == os.getpid():
+        try:
+            REGISTRY.flush()
+        except OSError:
+            pass
+
+
+# What is measured (see app.py, storage.py and responsibles.py)
+
+HTTP_REQUESTS = Counter('http_requests_total', 'Requests handled, by route, method and status',
+                        ('route', 'method', 'status'))
+HTTP_REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time to build a response, by route',
+                                  ('route', 'method'))
+HTTP_REQUEST_BYTES = Counter('http_request_bytes_total', 'Request body bytes received, by route', ('route',))
+HTTP_RESPONSE_BYTES = Counter('http_response_bytes_total',
+                              'Response body bytes sent, by route (streamed responses not included)', ('route',))
+TEMPLATE_RENDER_DURATION = Histogram('template_render_duration_seconds',
+                                     'Time to render a template or a dashboard row', ('template',),
+                                     buckets=DATA_BUCKETS)
+DATA_OPERATION_DURATION = Histogram(
+    'data_operation_duration_seconds',
+    'Time spent reading and writing data files (load_snapshot, load_journal, save_snapshot, '
+    'append_journal, load_responsibles, sqlite_transaction)', ('operation',), buckets=DATA_BUCKETS)
+DATA_READ_BYTES = Counter('data_read_bytes_total', 'Bytes read from data files', ('file',))
+DATA_WRITTEN_BYTES = Counter('data_written_bytes_total', 'Bytes written to data files', ('file',))
+STATUS_COMPUTE_DURATION = Histogram('activity_status_compute_seconds',
+                                    'Time to compute the overall status of an activity', buckets=FAST_BUCKETS)
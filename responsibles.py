@@ -0,0 +1,101 @@
+import os
+import json
+import logging
+import threading
+
+import metrics
+from storage import file_signature
+
+# Written to the responsibles file when it does not exist yet
+DEFAULT_RESPONSIBLES = {
+    "managers": ['Aline', 'Fábio', 'Marcos', 'Waldir', 'Mario', 'Washington', 'Wollinger'],
+    "director": "Washington"
+}
+
+
+class Responsibles:
+    """One version of the responsibles file; never changed after it is built
+
+    managers keeps the file order (the dashboard columns), manager_set is
+    for membership checks.
+    """
+
+    def __init__(self, managers, director, signature=None):
+        self.managers = tuple(managers)
+        self.manager_set = frozenset(self.managers)
+        self.director = director
+        self.signature = signature
+
+    def to_dict(self):
+        return {'managers': list(self.managers), 'director': self.director}
+
+
+class ResponsiblesRegistry:
+    """Cached view of data/responsibles.json shared by the routes and the CLI
+
+    current() returns the last loaded snapshot as long as the file signature
+    (mtime, size, inode) matches, so a request costs one stat instead of a
+    read and a parse. Changes made through save() are visible at once; changes
+    made by another process are picked up on the next current(). Snapshots
+    are replaced, never modified, so a request keeps a consistent view even
+    if the file changes while it runs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Return the current Responsibles snapshot, reloading it if the file changed"""
+        snapshot = self._snapshot
+        if snapshot is not None and file_signature(self.path) == snapshot.signature:
+            return snapshot
+        with self._lock:
+            # Another thread may have reloaded it while this one waited
+            snapshot = self._snapshot
+            signature = file_signature(self.path)
+            if snapshot is None or signature != snapshot.signature:
+                snapshot = self._load(snapshot)
+                self._snapshot = snapshot
+            return snapshot
+
+    @metrics.timed(metrics.DATA_OPERATION_DURATION, 'load_responsibles')
+    def _load(self, previous):
+        signature = file_signature(self.path)
+        try:
+            with open(self.path, 'rb') as f:
+                content = f.read()
+            metrics.DATA_READ_BYTES.inc(len(content), 'responsibles')
+            data = json.loads(content)
+            return Responsibles(data['managers'], data['director'], signature)
+        except FileNotFoundError:
+            # Criar o arquivo com valores padrão
+            return self._write(DEFAULT_RESPONSIBLES)
+        except (json.JSONDecodeError, KeyError) as e:
+            # Keep the last good list (or the defaults) until the file is fixed
+            logging.error(f"Invalid responsibles file {self.path}: {e}")
+            fallback = previous.to_dict() if previous is not None else DEFAULT_RESPONSIBLES
+            return Responsibles(fallback['managers'], fallback['director'], signature)
+
+    def _write(self, data):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        return Responsibles(data['managers'], data['director'], file_signature(self.path))
+
+    def save(self, data):
+        """Write {'managers', 'director'} to the file and make it the current snapshot
+
+        The file is replaced atomically, so other processes never read a
+        half-written list.
+        """
+        with self._lock:
+            self._snapshot = self._write(data)
+            return self._snapshot
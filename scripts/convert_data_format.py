@@ -0,0 +1,56 @@
+
+import os
+import sys
+import argparse
+
+# Allow importing the storage modules from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+import serialization
+from storage import ActivityStore
+
+def convert_data_format(path, data_format):
+    """Rewrite the activities snapshot in another format (journal included)"""
+
+    if not os.path.exists(path):
+        print(f"❌ Arquivo de dados não encontrado: {path}")
+        return False
+
+    with open(path, 'rb') as f:
+        current_format = serialization.detect_format(f.read(64))
+    size_before = os.path.getsize(path)
+
+    try:
+        store = ActivityStore(path, data_format=data_format)
+        data = store.load()
+        store.save(data)
+    except serialization.DecodeError as e:
+        print(f"❌ Erro ao ler os dados: {e}")
+        return False
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return False
+
+    # Verify the conversion
+    converted = ActivityStore(path).load()
+    if len(converted['activities']) != len(data['activities']):
+        print("❌ Quantidade de atividades convertidas não confere!")
+        return False
+
+    print(f"✅ Conversão concluída com sucesso!")
+    print(f"📁 Arquivo: {path}")
+    print(f"🔄 Formato: {current_format} → {data_format}")
+    print(f"📏 Tamanho: {size_before} → {os.path.getsize(path)} bytes")
+    print(f"📊 Atividades: {len(converted['activities'])}")
+    print(f"\n💡 Inicie o app com DATA_FORMAT={data_format} para manter este formato")
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converte data/activities.json para outro formato')
+    parser.add_argument('format', choices=serialization.FORMATS)
+    parser.add_argument('--file', default=os.path.join(PROJECT_ROOT, 'data', 'activities.json'))
+    args = parser.parse_args()
+
+    if not convert_data_format(args.file, args.format):
+        sys.exit(1)
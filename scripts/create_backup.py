@@ -1,8 +1,14 @@
 import os
+import sys
 import zipfile
 from datetime import datetime
 import shutil
 
+# Allow importing the storage modules from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshots import DataSnapshot
+
 def create_app_backup():
     """Create a ZIP backup of the entire application"""
 
@@ -49,7 +55,9 @@ def create_app_backup():
     ]
 
     try:
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        # Data files are read from a consistent snapshot, not from the live files
+        with DataSnapshot(project_root) as snapshot, \
+                zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
             # Walk through all files in current directory and subdirectories
             for root, dirs, files in os.walk('.'):
                 # Skip excluded directories
@@ -72,9 +80,12 @@ def create_app_backup():
                     # Create relative path for the zip
                     arcname = os.path.relpath(file_path, '.')
                     arcname = arcname.replace('\\', '/')  # Normalize path separators
+                    source = snapshot.source(arcname)
+                    if source is None:
+                        continue
 
                     try:
-                        zipf.write(file_path, arcname)
+                        zipf.write(source, arcname)
                         print(f"📁 Adicionado: {arcname}")
                     except Exception as e:
                         print(f"⚠️  Erro ao adicionar {file_path}: {e}")
@@ -1,9 +1,15 @@
 
 import os
+import sys
 import zipfile
 from datetime import datetime
 import shutil
 
+# Allow importing the storage modules from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snapshots import DataSnapshot
+
 def get_project_files():
     """Get all files in the project that should be backed up"""
     
@@ -86,10 +92,13 @@ def create_full_backup():
         print(f"   ... e mais {len(files_to_backup) - 10} arquivos")
     
     try:
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        # Data files are read from a consistent snapshot, not from the live files
+        with DataSnapshot(project_root) as snapshot, \
+                zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
             for file_path in files_to_backup:
-                if os.path.exists(file_path):
-                    zipf.write(file_path, file_path)
+                source = snapshot.source(file_path)
+                if source is not None and os.path.exists(source):
+                    zipf.write(source, file_path)
                     print(f"✅ Adicionado: {file_path}")
         
         # Get file size
@@ -1,124 +1,92 @@
 
-import json
 import os
+import sys
+import argparse
 from datetime import datetime
-import pandas as pd
+
+# Allow importing the storage modules from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from storage import open_store
+from serialization import DecodeError
+from exporter import EXPORT_FORMATS, SHEETS, iter_csv, write_xlsx
+
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 
 def load_activities_data():
-    """Load activities data from JSON file"""
-    activities_file = 'data/activities.json'
-    
-    if not os.path.exists(activities_file):
+    """Load the activities from the configured store (STORAGE_BACKEND, SQLITE_FILE)"""
+    backend = os.environ.get('STORAGE_BACKEND', 'json')
+    activities_file = os.path.join(DATA_DIR, 'activities.json')
+    sqlite_file = os.environ.get('SQLITE_FILE', os.path.join(DATA_DIR, 'activities.db'))
+
+    # A JSON store may still hold all of its changes in the journal
+    if backend == 'sqlite':
+        data_files = [sqlite_file]
+    else:
+        data_files = [activities_file, os.path.join(DATA_DIR, 'activities.journal')]
+    if not any(os.path.exists(path) for path in data_files):
         print("❌ Arquivo de dados não encontrado!")
         return None
-    
+
     try:
-        with open(activities_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data.get('activities', [])
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        store = open_store(backend, activities_file, sqlite_file, os.environ.get('DATA_FORMAT', 'json'))
+        return store.list_activities()
+    except (FileNotFoundError, DecodeError) as e:
         print(f"❌ Erro ao carregar dados: {e}")
         return None
 
-def export_to_excel():
-    """Export activities data to Excel file"""
-    
+def export_to_excel(fmt='xlsx'):
+    """Export activities data to an Excel workbook or CSV files
+
+    The workbook has a sheet listing the activities and one with the status
+    of each responsible; in CSV each of them is a separate file.
+    """
+
     # Load data
     activities = load_activities_data()
     if activities is None:
         return
-    
+
     if not activities:
         print("⚠️  Nenhuma atividade encontrada para exportar.")
         return
-    
-    # Prepare data for Excel
-    excel_data = []
-    
-    for activity in activities:
-        # Handle responsible field (can be string or list)
-        responsible = activity.get('responsible', '')
-        if isinstance(responsible, list):
-            responsible = ', '.join(responsible)
-        
-        # Parse dates
-        try:
-            created_at = datetime.fromisoformat(activity.get('created_at', '')).strftime('%d/%m/%Y %H:%M')
-        except:
-            created_at = activity.get('created_at', '')
-        
-        try:
-            deadline_str = activity.get('deadline', '')
-            if deadline_str:
-                deadline = datetime.strptime(deadline_str, '%Y-%m-%d').strftime('%d/%m/%Y')
-            else:
-                deadline = ''
-        except:
-            deadline = activity.get('deadline', '')
-        
-        excel_data.append({
-            'ID': activity.get('id', ''),
-            'Título': activity.get('title', ''),
-            'Descrição': activity.get('description', ''),
-            'Responsável': responsible,
-            'Status': activity.get('status', ''),
-            'Prazo': deadline,
-            'Criado por': activity.get('created_by', ''),
-            'Data de Criação': created_at,
-            'Comentário': activity.get('status_comment', ''),
-            'Justificativa': activity.get('justification', ''),
-            'Justificativa Aprovada': 'Sim' if activity.get('justification_approved') else 'Não'
-        })
-    
-    # Create DataFrame
-    df = pd.DataFrame(excel_data)
-    
+
     # Ensure exports directory exists
     if not os.path.exists('exports'):
         os.makedirs('exports')
-    
-    # Generate filename with timestamp
+
+    # Generate filenames with timestamp
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'exports/atividades_{timestamp}.xlsx'
-    
+
     try:
-        # Export to Excel
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Atividades', index=False)
-            
-            # Get workbook and worksheet
-            workbook = writer.book
-            worksheet = writer.sheets['Atividades']
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                
-                for cell in column:
-                    if cell.value:
-                        max_length = max(max_length, len(str(cell.value)))
-                
-                adjusted_width = min(max_length + 2, 50)  # Max width of 50
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            # Style header row
-            from openpyxl.styles import Font, PatternFill
-            header_font = Font(bold=True, color='FFFFFF')
-            header_fill = PatternFill(start_color='2F75B5', end_color='2F75B5', fill_type='solid')
-            
-            for cell in worksheet[1]:
-                cell.font = header_font
-                cell.fill = header_fill
-        
+        if fmt == 'xlsx':
+            filenames = [f'exports/atividades_{timestamp}.xlsx']
+            with open(filenames[0], 'wb') as f:
+                write_xlsx(activities, f)
+        else:
+            filenames = []
+            for sheet in SHEETS:
+                filename = f'exports/{sheet}_{timestamp}.csv'
+                with open(filename, 'wb') as f:
+                    for chunk in iter_csv(activities, sheet):
+                        f.write(chunk)
+                filenames.append(filename)
+
         print(f"✅ Exportação concluída com sucesso!")
-        print(f"📁 Arquivo: {filename}")
-        print(f"📊 Registros exportados: {len(excel_data)}")
-        
-    except Exception as e:
+        for filename in filenames:
+            print(f"📁 Arquivo: {filename}")
+        print(f"📊 Atividades exportadas: {len(activities)}")
+
+    except RuntimeError as e:
         print(f"❌ Erro ao exportar para Excel: {e}")
-        print("💡 Certifique-se de que o pandas e openpyxl estão instalados:")
-        print("   pip install pandas openpyxl")
+        print("💡 Instale o openpyxl ou exporte em CSV:")
+        print("   pip install openpyxl")
+        print("   python export_to_excel.py --format csv")
 
 if __name__ == '__main__':
-    export_to_excel()
+    parser = argparse.ArgumentParser(description='Exporta as atividades para Excel ou CSV')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='xlsx')
+    args = parser.parse_args()
+
+    export_to_excel(args.format)
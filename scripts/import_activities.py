@@ -0,0 +1,69 @@
+import os
+import sys
+import argparse
+from datetime import datetime
+
+# Allow importing the storage modules from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from storage import open_store
+from importer import IMPORT_FORMATS, IMPORT_BATCH_SIZE, detect_import_format, import_activities
+from responsibles import ResponsiblesRegistry
+
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+RESPONSIBLES_FILE = os.path.join(DATA_DIR, 'responsibles.json')
+
+def import_file(path, fmt=None, report_path=None, batch_size=IMPORT_BATCH_SIZE, user=None):
+    """Import activities from a CSV or JSONL file into the configured store"""
+
+    if not os.path.exists(path):
+        print(f"❌ Arquivo não encontrado: {path}")
+        return False
+
+    fmt = fmt or detect_import_format(path)
+    if fmt is None:
+        print("❌ Formato não reconhecido. Use --format csv ou --format jsonl")
+        return False
+
+    if not os.path.exists(RESPONSIBLES_FILE):
+        print(f"❌ Arquivo não encontrado: {RESPONSIBLES_FILE}")
+        return False
+    people = ResponsiblesRegistry(RESPONSIBLES_FILE).current()
+
+    store = open_store(os.environ.get('STORAGE_BACKEND', 'json'),
+                       os.path.join(DATA_DIR, 'activities.json'),
+                       os.environ.get('SQLITE_FILE', os.path.join(DATA_DIR, 'activities.db')),
+                       os.environ.get('DATA_FORMAT', 'json'))
+
+    if report_path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_path = f"{os.path.splitext(path)[0]}_erros_{timestamp}.csv"
+
+    def progress(stored):
+        print(f"   💾 Lote gravado: #{stored[0]['id']} a #{stored[-1]['id']}")
+
+    print(f"📥 Importando {path} ({fmt})...")
+    with open(path, 'rb') as f:
+        result = import_activities(store, f, fmt, people.manager_set,
+                                   user or people.director, report_path,
+                                   batch_size=batch_size, on_batch=progress)
+
+    print(f"✅ Atividades importadas: {result['imported']}")
+    if result['failed']:
+        print(f"⚠️  Linhas com erro: {result['failed']}")
+        print(f"📄 Relatório: {result['report']}")
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Importa atividades de um arquivo CSV ou JSONL')
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=IMPORT_FORMATS,
+                        help='padrão: pela extensão do arquivo')
+    parser.add_argument('--report', help='arquivo CSV com as linhas rejeitadas')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument('--user', help='autor registrado no histórico (padrão: o diretor)')
+    args = parser.parse_args()
+
+    if not import_file(args.file, args.format, args.report, args.batch_size, args.user):
+        sys.exit(1)
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import zlib
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# Allow importing the storage modules from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from snapshots import DataSnapshot
+
+BACKUP_DIR = os.path.join(PROJECT_ROOT, 'scripts', 'backups', 'incremental')
+
+# Same selection as create_backup.py
+EXCLUDE_PATTERNS = [
+    '__pycache__',
+    '.git',
+    'node_modules',
+    '.env',
+    'venv',
+    '.venv',
+    'backups',
+    'attached_assets'
+]
+
+def iter_project_files():
+    """Yield the project-relative path of every file that goes into a backup"""
+    for root, dirs, files in os.walk(PROJECT_ROOT):
+        dirs[:] = sorted(d for d in dirs if not any(pattern in d for pattern in EXCLUDE_PATTERNS))
+        for file in sorted(files):
+            if any(pattern in file for pattern in EXCLUDE_PATTERNS):
+                continue
+            if file.startswith('.') and file not in ['.replit']:
+                continue
+            path = os.path.join(root, file)
+            yield os.path.relpath(path, PROJECT_ROOT).replace('\\', '/')
+
+class BackupRepository:
+    """Content-addressed backup storage
+
+    Every distinct file content is stored once, zlib-compressed, as
+    blobs/<sha256[:2]>/<sha256>. A backup is a manifest in manifests/ that
+    maps each path to the hash of its content, so a new backup only writes
+    the blobs that are not in the repository yet. Files whose size and
+    modification time match the previous manifest are not even read.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.blobs_dir = os.path.join(directory, 'blobs')
+        self.manifests_dir = os.path.join(directory, 'manifests')
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Blobs are written from several threads, possibly the same one twice
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def has_blob(self, digest):
+        return os.path.exists(self._blob_path(digest))
+
+    def put_blob(self, data):
+        """Store content if it is new; returns (sha256, bytes written)
+
+        zlib releases the GIL while compressing, so blobs stored from
+        several threads are compressed in parallel.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has_blob(digest):
+            return digest, 0
+        compressed = zlib.compress(data, 6)
+        self._write_atomic(self._blob_path(digest), compressed)
+        return digest, len(compressed)
+
+    def get_blob(self, digest):
+        with open(self._blob_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f'Blob corrompido: {digest}')
+        return data
+
+    def list_backups(self):
+        """Return the backup names, oldest first"""
+        try:
+            names = os.listdir(self.manifests_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def read_manifest(self, name):
+        with open(os.path.join(self.manifests_dir, f'{name}.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_manifest(self, name, manifest):
+        data = json.dumps(manifest, ensure_ascii=False, indent=1).encode('utf-8')
+        self._write_atomic(os.path.join(self.manifests_dir, f'{name}.json'), data)
+
+    def delete_manifest(self, name):
+        os.remove(os.path.join(self.manifests_dir, f'{name}.json'))
+
+    def collect_garbage(self):
+        """Delete blobs no manifest refers to; returns (blobs, bytes) removed"""
+        referenced = set()
+        for name in self.list_backups():
+            referenced.update(entry['hash'] for entry in self.read_manifest(name)['files'].values())
+        removed = freed = 0
+        for root, dirs, files in os.walk(self.blobs_dir):
+            for file in files:
+                if file not in referenced:
+                    path = os.path.join(root, file)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+        return removed, freed
+
+def create_backup(repo, workers=None):
+    """Store the files that changed since the last backup and write a new manifest
+
+    Data files come from a consistent snapshot (see snapshots.py). Changed
+    files are hashed and compressed by a pool of workers, one per core by
+    default.
+    """
+    backups = repo.list_backups()
+    previous = repo.read_manifest(backups[-1])['files'] if backups else {}
+
+    files = {}
+    pending = []
+    reused = 0
+    with DataSnapshot(PROJECT_ROOT) as snapshot:
+        for path in iter_project_files():
+            full_path = os.path.join(PROJECT_ROOT, path)
+            source = snapshot.source(path)
+            if source is None:
+                continue
+            try:
+                st = os.stat(full_path)
+            except FileNotFoundError:
+                continue
+            entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'mode': st.st_mode & 0o777}
+            files[path] = entry
+
+            # Snapshot copies are always new files, so only live files can be skipped
+            known = previous.get(path)
+            if (source == full_path and known and known['size'] == entry['size']
+                    and known['mtime_ns'] == entry['mtime_ns'] and repo.has_blob(known['hash'])):
+                entry['hash'] = known['hash']
+                reused += 1
+            else:
+                pending.append((entry, source))
+
+        def store(item):
+            entry, source = item
+            with open(source, 'rb') as f:
+                data = f.read()
+            entry['hash'], written = repo.put_blob(data)
+            entry['size'] = len(data)
+            return written
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            sizes = list(pool.map(store, pending))
+
+    name = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    repo.write_manifest(name, {
+        'created_at': datetime.now().isoformat(),
+        'data_versions': snapshot.versions,
+        'files': files
+    })
+
+    new_blobs = sum(1 for size in sizes if size)
+    print(f"✅ Backup incremental criado: {name}")
+    print(f"🗂️  Arquivos: {len(files)} ({reused} sem alteração)")
+    print(f"💾 Novos blobs: {new_blobs} ({sum(sizes) / 1024:.2f} KB gravados)")
+    return name
+
+def restore_backup(repo, name, target):
+    """Rebuild the files of a backup under target"""
+    backups = repo.list_backups()
+    if name == 'latest' and backups:
+        name = backups[-1]
+    if name not in backups:
+        print(f"❌ Backup não encontrado: {name}")
+        return False
+
+    files = repo.read_manifest(name)['files']
+    for path, entry in files.items():
+        full_path = os.path.join(target, path)
+        os.makedirs(os.path.dirname(full_path) or '.', exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(repo.get_blob(entry['hash']))
+        os.chmod(full_path, entry.get('mode', 0o644))
+        os.utime(full_path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+
+    print(f"✅ Backup {name} restaurado em: {target}")
+    print(f"🗂️  Arquivos: {len(files)}")
+    return True
+
+def prune_backups(repo, keep_last, keep_days):
+    """Delete backups beyond the newest keep_last that are older than keep_days"""
+    backups = repo.list_backups()
+    cutoff = datetime.now() - timedelta(days=keep_days)
+    keep = set(backups[-keep_last:]) if keep_last > 0 else set()
+    removed = 0
+    for name in backups:
+        if name in keep:
+            continue
+        created_at = datetime.fromisoformat(repo.read_manifest(name)['created_at'])
+        if created_at < cutoff:
+            repo.delete_manifest(name)
+            removed += 1
+
+    blobs, freed = repo.collect_garbage()
+    print(f"🧹 Backups removidos: {removed} (restam {len(backups) - removed})")
+    print(f"💾 Blobs removidos: {blobs} ({freed / 1024:.2f} KB liberados)")
+
+def list_backups(repo):
+    backups = repo.list_backups()
+    if not backups:
+        print("⚠️  Nenhum backup incremental encontrado.")
+        return
+    print(f"📋 Backups incrementais ({len(backups)}):")
+    for name in backups:
+        manifest = repo.read_manifest(name)
+        total = sum(entry['size'] for entry in manifest['files'].values())
+        print(f"   {name}  {len(manifest['files'])} arquivos, {total / (1024 * 1024):.2f} MB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backups incrementais com deduplicação por conteúdo')
+    parser.add_argument('--repository', default=BACKUP_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    backup = commands.add_parser('backup', help='cria um novo backup')
+    backup.add_argument('--workers', type=int, help='threads de compressão (padrão: uma por núcleo)')
+    restore = commands.add_parser('restore', help='restaura um backup em um diretório')
+    restore.add_argument('name', help='nome do backup (ou "latest")')
+    restore.add_argument('--target', default='restored_backup')
+    prune = commands.add_parser('prune', help='remove backups antigos e blobs sem uso')
+    prune.add_argument('--keep-last', type=int, default=7, help='backups mais recentes sempre mantidos')
+    prune.add_argument('--keep-days', type=int, default=30, help='mantém backups mais novos que isso')
+    commands.add_parser('list', help='lista os backups')
+    args = parser.parse_args()
+
+    repo = BackupRepository(args.repository)
+    if args.command == 'backup':
+        create_backup(repo, args.workers)
+    elif args.command == 'restore':
+        if not restore_backup(repo, args.name, args.target):
+            sys.exit(1)
+    elif args.command == 'prune':
+        prune_backups(repo, args.keep_last, args.keep_days)
+    else:
+        list_backups(repo)
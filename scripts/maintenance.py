@@ -10,14 +10,14 @@ import sys
 import subprocess
 from datetime import datetime
 
-def run_script(script_name, description):
+def run_script(script_name, description, *args):
     """Execute a Python script and return success status"""
     print(f"\n{'='*50}")
     print(f"🔧 {description}")
     print(f"{'='*50}")
     
     try:
-        result = subprocess.run([sys.executable, script_name], 
+        result = subprocess.run([sys.executable, script_name, *args], 
                               cwd=os.path.dirname(__file__),
                               capture_output=False, 
                               text=True)
@@ -32,7 +32,7 @@ def main():
     print("=" * 50)
     print("Este script irá:")
     print("1. 🧹 Limpar arquivos não utilizados")
-    print("2. 🗃️  Criar backup completo do aplicativo")
+    print("2. 🗃️  Criar backup incremental do aplicativo")
     print("=" * 50)
     
     # Confirm execution
@@ -52,7 +52,8 @@ def main():
         print("❌ Erro na limpeza de arquivos!")
     
     # Step 2: Backup
-    if run_script('create_backup.py', 'Criando Backup do Aplicativo'):
+    # Only files changed since the last run are stored
+    if run_script('incremental_backup.py', 'Criando Backup do Aplicativo', 'backup'):
         success_count += 1
         print("✅ Backup concluído com sucesso!")
     else:
@@ -0,0 +1,61 @@
+
+import os
+import sys
+import argparse
+
+# Allow importing the storage modules from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from storage import ActivityStore
+from sqlite_store import SQLiteActivityStore
+
+def migrate_to_sqlite(json_path, sqlite_path, force=False):
+    """Import the activities JSON file into a SQLite database"""
+
+    source = ActivityStore(json_path)
+    # A JSON store may still hold all of its changes in the journal
+    if not any(os.path.exists(path) for path in (json_path, source.journal_path)):
+        print(f"❌ Arquivo de dados não encontrado: {json_path}")
+        return False
+
+    data = source.load()
+    target = SQLiteActivityStore(sqlite_path)
+
+    # History lives in data/history/ (older files may still embed it in the records)
+    data['activities'] = [
+        {**activity, 'history': activity.get('history') or source.history.read_all(activity['id'])}
+        for activity in data['activities']
+    ]
+
+    existing = target.load()
+    if existing['activities'] and not force:
+        print(f"⚠️  O banco {sqlite_path} já possui {len(existing['activities'])} atividades.")
+        print("   Use --force para substituir o conteúdo.")
+        return False
+
+    target.save(data)
+
+    # Verify the import
+    imported = target.load()
+    if len(imported['activities']) != len(data['activities']):
+        print("❌ Quantidade de atividades importadas não confere!")
+        return False
+
+    print(f"✅ Migração concluída com sucesso!")
+    print(f"📁 Origem: {json_path}")
+    print(f"🗄️  Destino: {sqlite_path}")
+    print(f"📊 Atividades importadas: {len(imported['activities'])}")
+    print(f"🔢 Próximo ID: {imported['next_id']}")
+    print("\n💡 Para usar o banco, inicie o app com STORAGE_BACKEND=sqlite")
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migra data/activities.json para SQLite')
+    parser.add_argument('--source', default=os.path.join(PROJECT_ROOT, 'data', 'activities.json'))
+    parser.add_argument('--target', default=os.path.join(PROJECT_ROOT, 'data', 'activities.db'))
+    parser.add_argument('--force', action='store_true', help='Substitui os dados já existentes no banco')
+    args = parser.parse_args()
+
+    if not migrate_to_sqlite(args.source, args.target, args.force):
+        sys.exit(1)
@@ -1,28 +1,43 @@
 
-import json
 import os
+import sys
+import shutil
+
+# Allow importing the storage modules from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from storage import open_store
+
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
 
 def reset_activities_data():
-    """Reset activities data to initial state"""
-    
-    # Ensure data directory exists
-    if not os.path.exists('data'):
-        os.makedirs('data')
-    
-    # Initial data structure
-    initial_data = {
-        "activities": [],
-        "next_id": 1
-    }
-    
-    # Write to file
-    activities_file = 'data/activities.json'
-    with open(activities_file, 'w', encoding='utf-8') as f:
-        json.dump(initial_data, f, ensure_ascii=False, indent=2)
-    
+    """Reset activities data to initial state
+
+    The reset goes through the store like any other change, so the data
+    version keeps moving forward (pages cached by browsers before the reset
+    are not taken for current ones) and the journal is emptied. Activity ids
+    are not reused: a new activity never takes the id, the cached dashboard
+    rows or the history of a deleted one.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+    activities_file = os.path.join(DATA_DIR, 'activities.json')
+    store = open_store(os.environ.get('STORAGE_BACKEND', 'json'),
+                       activities_file,
+                       os.environ.get('SQLITE_FILE', os.path.join(DATA_DIR, 'activities.db')),
+                       os.environ.get('DATA_FORMAT', 'json'))
+
+    next_id = store.load().get('next_id', 1)
+    store.save({"activities": [], "next_id": next_id})
+
+    # The JSON backend keeps history in files of its own (SQLite deletes it with the rows)
+    history = getattr(store, 'history', None)
+    if history is not None and os.path.isdir(history.directory):
+        shutil.rmtree(history.directory)
+
     print(f"✅ Dados zerados com sucesso!")
-    print(f"📁 Arquivo: {activities_file}")
-    print(f"📊 Status: Dados resetados para estado inicial")
+    print(f"📁 Armazenamento: {os.environ.get('STORAGE_BACKEND', 'json')}")
+    print(f"📊 Status: Dados resetados para estado inicial (próxima atividade: #{next_id})")
 
 if __name__ == '__main__':
     # Confirm action
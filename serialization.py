@@ -0,0 +1,68 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON encoding/decoding
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: binary snapshot format
+    msgpack = None
+
+# Formats a data file can be written in. Reading detects the format by itself.
+#   json         compact JSON (orjson when installed)
+#   json-indent  indented JSON, easier to read and diff by hand
+#   msgpack      binary MessagePack snapshot (requires the msgpack package)
+FORMATS = ('json', 'json-indent', 'msgpack')
+
+UTF8_BOM = b'\xef\xbb\xbf'
+
+
+class DecodeError(ValueError):
+    """Raised when a data file cannot be decoded"""
+
+
+def dumps(obj, fmt='json'):
+    """Serialize obj to bytes in the given format"""
+    if fmt == 'json':
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if fmt == 'json-indent':
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    if fmt == 'msgpack':
+        if msgpack is None:
+            raise RuntimeError('The msgpack format requires the msgpack package (pip install msgpack)')
+        return msgpack.packb(obj, use_bin_type=True)
+    raise ValueError(f'Unknown data format: {fmt}')
+
+
+def detect_format(data):
+    """Return 'json' or 'msgpack' for the raw bytes of a data file"""
+    if data.startswith(UTF8_BOM):
+        data = data[len(UTF8_BOM):]
+    head = data.lstrip(b' \t\r\n')[:1]
+    if not head or head in (b'{', b'['):
+        return 'json'
+    return 'msgpack'
+
+
+def loads(data):
+    """Deserialize bytes written by dumps(), whatever their format"""
+    if data.startswith(UTF8_BOM):
+        data = data[len(UTF8_BOM):]
+    try:
+        if detect_format(data) == 'json':
+            if orjson is not None:
+                return orjson.loads(data)
+            return json.loads(data)
+        if msgpack is None:
+            raise DecodeError('Data file is in msgpack format, but msgpack is not installed')
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    except DecodeError:
+        raise
+    except Exception as e:
+        raise DecodeError(str(e)) from e
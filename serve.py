@@ -0,0 +1,149 @@
+"""Production server: a pool of gunicorn worker processes running the app
+
+    python serve.py [--bind 0.0.0.0:5000] [--workers N] [--threads N]
+
+Every worker reads and writes the same data files: the JSON store
+serializes commits with a file lock and re-reads the snapshot when another
+process changed it, the SQLite store relies on SQLite's own locking, and
+live update events go through data/events.jsonl (see events.py). So any
+number of workers see the same data.
+
+Every page with live updates holds a worker thread through its /events
+stream for as long as it is open. A worker keeps at most --event-streams
+of them (default: half its threads) so the other threads stay free for
+ordinary requests; pages refused a stream poll /events/version every 30s
+instead. Plan for workers x event-streams open tabs with live updates,
+and raise --threads along with --event-streams for more.
+
+Settings also come from the environment (PORT, WEB_CONCURRENCY, THREADS,
+MAX_EVENT_STREAMS, KEEPALIVE, PRELOAD_DATA). Send SIGHUP to the master to replace the
+workers gracefully, SIGTERM to stop after the running requests finish.
+"""
+import os
+import sys
+import argparse
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn does not run on Windows
+    BaseApplication = None
+
+from logging_setup import configure_logging
+
+
+def cpu_count():
+    """Cores this process may run on (respects CPU affinity, e.g. in containers)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def server_options(args):
+    """gunicorn settings for the parsed command line"""
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        # Threads let a worker keep serving while a request waits on disk,
+        # and hold the open /events streams of live pages (see --event-streams)
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        # Idle keep-alive connections a worker holds on to, and for how long
+        'worker_connections': args.worker_connections,
+        'keepalive': args.keepalive,
+        'timeout': 30,
+        # Old workers get this long to finish their requests on reload or stop;
+        # /events streams never finish, browsers reconnect to the new workers
+        'graceful_timeout': 10,
+        # Recycle workers now and then, spread out so they do not restart together
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'preload_app': args.preload,
+        'accesslog': '-' if args.access_log else None,
+        'errorlog': '-',
+        'loglevel': 'info',
+        'proc_name': 'atividades',
+    }
+    # Worker heartbeats are file writes; keep them off slow or overlay disks
+    if os.path.isdir('/dev/shm'):
+        options['worker_tmp_dir'] = '/dev/shm'
+    return options
+
+
+if BaseApplication is not None:
+    class Server(BaseApplication):
+        """gunicorn application that builds the app with create_app()
+
+        With preload the app is created and its data loaded in the master,
+        then shared copy-on-write by the forked workers. SIGHUP then starts
+        new workers from that same master copy (the data is revalidated on
+        every request, but code changes need a restart); without preload
+        every worker creates its own app and SIGHUP also picks up new code.
+        """
+
+        def __init__(self, options, app_config=None):
+            self.options = options
+            self.app_config = app_config
+            self.application = None
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            # Imported here so that without preload the master never loads
+            # the app code, and workers started by SIGHUP import it afresh
+            from app import create_app, preload
+            if self.application is None:
+                self.application = create_app(self.app_config)
+                if self.cfg.preload_app:
+                    preload(self.application)
+            return self.application
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor de produção do aplicativo')
+    parser.add_argument('--bind', default=f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', cpu_count())),
+                        help='processos (padrão: um por núcleo)')
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('THREADS', 8)),
+                        help='threads por processo')
+    parser.add_argument('--event-streams', type=int, default=os.environ.get('MAX_EVENT_STREAMS'),
+                        help='conexões de atualização ao vivo (/events) por processo (padrão: metade das threads)')
+    parser.add_argument('--worker-connections', type=int, default=1000,
+                        help='conexões simultâneas por processo')
+    parser.add_argument('--keepalive', type=int, default=int(os.environ.get('KEEPALIVE', 5)),
+                        help='segundos que uma conexão ociosa fica aberta')
+    parser.add_argument('--max-requests', type=int, default=10000,
+                        help='requisições antes de reiniciar um processo (0 desliga)')
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        default=os.environ.get('PRELOAD_DATA', '1') == '1',
+                        help='cada processo carrega o aplicativo (SIGHUP recarrega o código)')
+    parser.add_argument('--access-log', action='store_true', help='registra cada requisição')
+    parser.add_argument('--dev', action='store_true',
+                        help='servidor de desenvolvimento do Flask (um processo, debug)')
+    args = parser.parse_args(argv)
+    if args.event_streams is None:
+        args.event_streams = max(args.threads // 2, 1)
+    app_config = {'MAX_EVENT_STREAMS': args.event_streams}
+
+    if args.dev:
+        from app import create_app
+        configure_logging(level=os.environ.get('LOG_LEVEL', 'DEBUG'),
+                          fmt=os.environ.get('LOG_FORMAT', 'text'), debug_sample=1)
+        host, _, port = args.bind.rpartition(':')
+        create_app(app_config).run(host=host or '0.0.0.0', port=int(port), debug=True)
+        return
+
+    if BaseApplication is None:
+        print("❌ gunicorn não está instalado (pip install gunicorn). Use --dev para o servidor de desenvolvimento.")
+        sys.exit(1)
+    # Workers inherit this setup; each gets its own log thread after fork
+    configure_logging()
+    Server(server_options(args), app_config).run()
+
+
+if __name__ == '__main__':
+    main()
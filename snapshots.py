@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+
+import serialization
+from storage import ActivityStore
+from sqlite_store import copy_database
+
+# Data files a backup takes from a consistent snapshot instead of the disk
+ACTIVITIES_FILE = 'data/activities.json'
+SQLITE_FILE = 'data/activities.db'
+HISTORY_DIR = 'data/history/'
+
+# Files that are folded into a snapshot, or only matter to a running app
+SKIPPED_FILES = (
+    'data/activities.journal',
+    'data/activities.lock',
+    'data/activities.db-wal',
+    'data/activities.db-shm',
+)
+SKIPPED_PREFIXES = ('data/events.jsonl',)
+SKIPPED_SUFFIXES = ('.tmp', '.lock')
+
+
+class DataSnapshot:
+    """Point-in-time copies of the data files, for backup scripts
+
+    Reading data/activities.json, its journal or the SQLite database with
+    plain file reads can catch a commit halfway. Within the context,
+    source(path) gives the file a backup should read for a project path:
+
+    - the activities snapshot and journal are replaced by one snapshot
+      file taken through ActivityStore.snapshot_to()
+    - the SQLite database is copied with the online backup API
+    - history files are cut after their last complete line
+    - lock files, WAL files and the live events file are skipped (None)
+
+    Nothing here waits for the app: snapshots only take the store's read
+    lock for as long as it takes to copy a list of references.
+    """
+
+    def __init__(self, project_root):
+        self.project_root = project_root
+        self.versions = {}
+        self._replacements = {}
+        self._tmp_dir = None
+
+    def __enter__(self):
+        self._tmp_dir = tempfile.mkdtemp(prefix='data_snapshot_')
+        try:
+            json_path = os.path.join(self.project_root, ACTIVITIES_FILE)
+            journal_path = os.path.join(self.project_root, 'data', 'activities.journal')
+            if os.path.exists(json_path) or os.path.exists(journal_path):
+                # Keep the format the snapshot is written in on disk
+                data_format = 'json'
+                if os.path.exists(json_path):
+                    with open(json_path, 'rb') as f:
+                        data_format = serialization.detect_format(f.read(64))
+                target = os.path.join(self._tmp_dir, 'activities.json')
+                store = ActivityStore(json_path, data_format=data_format)
+                self.versions[ACTIVITIES_FILE] = store.snapshot_to(target)
+                self._replacements[ACTIVITIES_FILE] = target
+
+            sqlite_path = os.path.join(self.project_root, SQLITE_FILE)
+            if os.path.exists(sqlite_path):
+                target = os.path.join(self._tmp_dir, 'activities.db')
+                copy_database(sqlite_path, target)
+                self._replacements[SQLITE_FILE] = target
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+
+    def source(self, path):
+        """Return the file to read for project path, or None to leave it out"""
+        if path in self._replacements:
+            return self._replacements[path]
+        if (path in SKIPPED_FILES or path.startswith(SKIPPED_PREFIXES)
+                or path.endswith(SKIPPED_SUFFIXES)):
+            return None
+        full_path = os.path.join(self.project_root, path)
+        if path.startswith(HISTORY_DIR):
+            return self._complete_lines(path, full_path)
+        return full_path
+
+    def _complete_lines(self, path, full_path):
+        """Copy an append-only file up to its last newline (an append may be in progress)"""
+        try:
+            with open(full_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        end = data.rfind(b'\n') + 1
+        if end == len(data):
+            return full_path
+        target = os.path.join(self._tmp_dir, 'history', os.path.basename(path))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data[:end])
+        return target
@@ -0,0 +1,507 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+from storage import ConflictError, normalize_activity
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS activities (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    deadline TEXT NOT NULL DEFAULT '',
+    created_by TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT '',
+    version INTEGER NOT NULL DEFAULT 0,
+    overall_status TEXT NOT NULL DEFAULT 'Pendente',
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_activities_deadline ON activities (deadline);
+
+CREATE TABLE IF NOT EXISTS activity_responsibles (
+    activity_id INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+    person TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (activity_id, person)
+);
+CREATE INDEX IF NOT EXISTS idx_activity_responsibles_person ON activity_responsibles (person, activity_id);
+
+CREATE TABLE IF NOT EXISTS responsible_status (
+    activity_id INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+    person TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'Pendente',
+    comment TEXT NOT NULL DEFAULT '',
+    justification TEXT NOT NULL DEFAULT '',
+    justification_approved INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (activity_id, person)
+);
+CREATE INDEX IF NOT EXISTS idx_responsible_status_person ON responsible_status (person, status);
+
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    activity_id INTEGER NOT NULL REFERENCES activities (id) ON DELETE CASCADE,
+    timestamp TEXT NOT NULL,
+    action TEXT NOT NULL,
+    user TEXT NOT NULL DEFAULT '',
+    comment TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_history_activity ON history (activity_id, id);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Dashboard counters, kept up to date by triggers on every write
+COUNTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS status_counts (
+    status TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS responsible_status_counts (
+    person TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (person, status)
+);
+
+CREATE TRIGGER IF NOT EXISTS activities_count_insert AFTER INSERT ON activities BEGIN
+    INSERT INTO status_counts (status, total) VALUES (NEW.overall_status, 1)
+        ON CONFLICT (status) DO UPDATE SET total = total + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS activities_count_delete AFTER DELETE ON activities BEGIN
+    UPDATE status_counts SET total = total - 1 WHERE status = OLD.overall_status;
+END;
+
+CREATE TRIGGER IF NOT EXISTS activities_count_update AFTER UPDATE OF overall_status ON activities
+WHEN OLD.overall_status IS NOT NEW.overall_status BEGIN
+    UPDATE status_counts SET total = total - 1 WHERE status = OLD.overall_status;
+    INSERT INTO status_counts (status, total) VALUES (NEW.overall_status, 1)
+        ON CONFLICT (status) DO UPDATE SET total = total + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS responsible_status_count_insert AFTER INSERT ON responsible_status BEGIN
+    INSERT INTO responsible_status_counts (person, status, total) VALUES (NEW.person, NEW.status, 1)
+        ON CONFLICT (person, status) DO UPDATE SET total = total + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS responsible_status_count_delete AFTER DELETE ON responsible_status BEGIN
+    UPDATE responsible_status_counts SET total = total - 1
+        WHERE person = OLD.person AND status = OLD.status;
+END;
+
+CREATE TRIGGER IF NOT EXISTS responsible_status_count_update AFTER UPDATE OF person, status ON responsible_status
+WHEN OLD.person IS NOT NEW.person OR OLD.status IS NOT NEW.status BEGIN
+    UPDATE responsible_status_counts SET total = total - 1
+        WHERE person = OLD.person AND status = OLD.status;
+    INSERT INTO responsible_status_counts (person, status, total) VALUES (NEW.person, NEW.status, 1)
+        ON CONFLICT (person, status) DO UPDATE SET total = total + 1;
+END;
+"""
+
+# Columns of the activities table; every other key of an activity goes to `extra`
+CORE_FIELDS = ('title', 'description', 'deadline', 'created_by', 'created_at')
+# Keys stored in dedicated columns or tables
+STRUCTURED_FIELDS = ('id', 'version', 'overall_status', 'responsible', 'responsible_status', 'history')
+
+
+def copy_database(path, target_path):
+    """Copy a live database to target_path with SQLite's online backup API
+
+    The whole copy is made in one step, inside a single read transaction:
+    in WAL mode that neither waits for nor holds up writers, and the copy is
+    the database as of the moment the transaction started.
+    """
+    tmp_path = f'{target_path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    source = sqlite3.connect(path, timeout=30)
+    try:
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    os.replace(tmp_path, target_path)
+
+
+class SQLiteActivityStore:
+    """Activity store backed by a SQLite database.
+
+    Exposes the same interface as storage.ActivityStore, but single-activity
+    and per-responsible reads are answered with indexed queries instead of
+    loading the whole dataset. History stays in its own table and is only
+    read through get_history(). overall_status is stored with each activity
+    and the dashboard counters live in tables maintained by triggers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        # Databases created before activities were versioned
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(activities)')}
+        if 'version' not in columns:
+            conn.execute('ALTER TABLE activities ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        # Databases created before overall_status was stored
+        rewrite = 'overall_status' not in columns
+        if rewrite:
+            conn.execute("ALTER TABLE activities ADD COLUMN overall_status TEXT NOT NULL DEFAULT 'Pendente'")
+        rebuild = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'status_counts'").fetchone() is None
+        conn.executescript(COUNTERS_SCHEMA)
+        if rewrite or rebuild:
+            with self._transaction() as conn:
+                if rewrite:
+                    for activity in self._query_activities(conn):
+                        self._write_activity(conn, activity)
+                self._rebuild_counters(conn)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # A connection must not be used across fork(): a worker forked from a
+        # preloaded master opens its own
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        with metrics.DATA_OPERATION_DURATION.time('sqlite_transaction'):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    # Reading
+
+    def _next_id(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        return int(row['value']) if row else 1
+
+    def data_version(self):
+        """Return a number that changes whenever any activity changes"""
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()
+        return int(row['value']) if row else 0
+
+    def snapshot_to(self, path):
+        """Write a consistent copy of the database to path, for backups
+
+        Returns the data version it holds.
+        """
+        copy_database(self.path, path)
+        conn = sqlite3.connect(path)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()
+        finally:
+            conn.close()
+        return int(row[0]) if row else 0
+
+    def modified_time(self):
+        """Return the time of the last write to the database files (epoch seconds)"""
+        times = [0]
+        for path in (self.path, f'{self.path}-wal'):
+            try:
+                times.append(os.stat(path).st_mtime)
+            except FileNotFoundError:
+                pass
+        return max(times)
+
+    def _query_activities(self, conn, condition=None, params=()):
+        """Build the dict records used by the routes.
+
+        condition filters activity ids and uses an {id} placeholder for the id
+        column, so the same filter drives the activities query and the
+        queries on the per-activity tables.
+        """
+        def where(column):
+            return f'WHERE {condition.format(id=column)}' if condition else ''
+
+        activities = {}
+        for row in conn.execute(f'SELECT * FROM activities {where("id")} ORDER BY id', params):
+            activity = {'id': row['id']}
+            for field in CORE_FIELDS:
+                activity[field] = row[field]
+            activity['version'] = row['version']
+            activity['responsible'] = []
+            activity['responsible_status'] = {}
+            activity.update(json.loads(row['extra']))
+            activity['overall_status'] = row['overall_status']
+            activities[row['id']] = activity
+
+        if not activities:
+            return []
+
+        for row in conn.execute(
+                f'SELECT activity_id, person FROM activity_responsibles {where("activity_id")} '
+                f'ORDER BY activity_id, position', params):
+            activities[row['activity_id']]['responsible'].append(row['person'])
+
+        for row in conn.execute(
+                f'SELECT * FROM responsible_status {where("activity_id")} '
+                f'ORDER BY activity_id, position', params):
+            activities[row['activity_id']]['responsible_status'][row['person']] = {
+                'status': row['status'],
+                'comment': row['comment'],
+                'justification': row['justification'],
+                'justification_approved': bool(row['justification_approved'])
+            }
+
+        return list(activities.values())
+
+    def load(self):
+        """Return the whole dataset in the activities.json document layout"""
+        conn = self._connection()
+        return {
+            "activities": self._query_activities(conn),
+            "next_id": self._next_id(conn)
+        }
+
+    def get_activity(self, activity_id):
+        """Return the activity with the given id, or None"""
+        activities = self._query_activities(self._connection(), '{id} = ?', (activity_id,))
+        return activities[0] if activities else None
+
+    def list_activities(self, responsible=None):
+        """Return all activities, or only those assigned to responsible"""
+        if responsible is None:
+            return self._query_activities(self._connection())
+        return self._query_activities(
+            self._connection(),
+            '{id} IN (SELECT activity_id FROM activity_responsibles WHERE person = ?)',
+            (responsible,))
+
+    def count_by_responsible(self, names):
+        """Return {name: number of activities assigned to name}"""
+        counts = {name: 0 for name in names}
+        for row in self._connection().execute(
+                'SELECT person, COUNT(*) AS total FROM activity_responsibles GROUP BY person'):
+            if row['person'] in counts:
+                counts[row['person']] = row['total']
+        return counts
+
+    def has_activities(self, name):
+        """Return True if name is responsible for at least one activity"""
+        row = self._connection().execute(
+            'SELECT 1 FROM activity_responsibles WHERE person = ? LIMIT 1', (name,)).fetchone()
+        return row is not None
+
+    def status_counts(self):
+        """Return the dashboard counters, maintained by triggers on every write
+
+        {'total': n, 'overall': {status: n}, 'by_responsible': {person: {status: n}}}
+        """
+        conn = self._connection()
+        overall = {row['status']: row['total'] for row in conn.execute(
+            'SELECT status, total FROM status_counts WHERE total > 0')}
+        by_responsible = {}
+        for row in conn.execute(
+                'SELECT person, status, total FROM responsible_status_counts WHERE total > 0'):
+            by_responsible.setdefault(row['person'], {})[row['status']] = row['total']
+        return {
+            'total': sum(overall.values()),
+            'overall': overall,
+            'by_responsible': by_responsible
+        }
+
+    # Writing
+
+    def _bump_version(self, conn):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('seq', '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1")
+
+    def _rebuild_counters(self, conn):
+        """Recompute the counter tables from scratch"""
+        conn.execute('DELETE FROM status_counts')
+        conn.execute(
+            'INSERT INTO status_counts (status, total) '
+            'SELECT overall_status, COUNT(*) FROM activities GROUP BY overall_status')
+        conn.execute('DELETE FROM responsible_status_counts')
+        conn.execute(
+            'INSERT INTO responsible_status_counts (person, status, total) '
+            'SELECT person, status, COUNT(*) FROM responsible_status GROUP BY person, status')
+
+    def _write_activity(self, conn, activity):
+        """Insert or replace one activity and its per-responsible rows"""
+        normalize_activity(activity)
+        activity_id = activity['id']
+        extra = {k: v for k, v in activity.items()
+                 if k not in CORE_FIELDS and k not in STRUCTURED_FIELDS}
+        conn.execute(
+            'INSERT INTO activities '
+            '(id, title, description, deadline, created_by, created_at, version, overall_status, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (id) DO UPDATE SET title = excluded.title, '
+            'description = excluded.description, deadline = excluded.deadline, '
+            'created_by = excluded.created_by, created_at = excluded.created_at, '
+            'version = excluded.version, overall_status = excluded.overall_status, '
+            'extra = excluded.extra',
+            (activity_id, *(activity.get(field, '') for field in CORE_FIELDS),
+             activity.get('version', 0), activity['overall_status'],
+             json.dumps(extra, ensure_ascii=False)))
+
+        conn.execute('DELETE FROM activity_responsibles WHERE activity_id = ?', (activity_id,))
+        responsible = activity['responsible']
+        conn.executemany(
+            'INSERT OR IGNORE INTO activity_responsibles (activity_id, person, position) '
+            'VALUES (?, ?, ?)',
+            [(activity_id, person, position) for position, person in enumerate(responsible)])
+
+        conn.execute('DELETE FROM responsible_status WHERE activity_id = ?', (activity_id,))
+        conn.executemany(
+            'INSERT INTO responsible_status '
+            '(activity_id, person, position, status, comment, justification, justification_approved) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(activity_id, person, position, info.get('status', 'Pendente'),
+              info.get('comment', ''), info.get('justification', ''),
+              int(bool(info.get('justification_approved'))))
+             for position, (person, info) in enumerate(activity.get('responsible_status', {}).items())])
+
+    def _insert_history(self, conn, activity_id, entries):
+        conn.executemany(
+            'INSERT INTO history (activity_id, timestamp, action, user, comment) VALUES (?, ?, ?, ?, ?)',
+            [(activity_id, entry.get('timestamp', ''), entry.get('action', ''),
+              entry.get('user', ''), entry.get('comment', ''))
+             for entry in entries])
+
+    def save(self, data):
+        """Replace the whole dataset with the given document
+
+        Activities are updated in place and only those missing from the
+        document are deleted: deleting a row also deletes its history, which
+        load() does not return. Records that still embed a 'history' list
+        have it imported into the history table, replacing the history they
+        had, so saving the same document twice does not duplicate it.
+        """
+        with self._transaction() as conn:
+            activities = data.get('activities', [])
+            kept = {activity['id'] for activity in activities}
+            conn.executemany('DELETE FROM activities WHERE id = ?',
+                             [(row['id'],) for row in conn.execute('SELECT id FROM activities')
+                              if row['id'] not in kept])
+            for activity in activities:
+                self._write_activity(conn, activity)
+                if 'history' in activity:
+                    conn.execute('DELETE FROM history WHERE activity_id = ?', (activity['id'],))
+                    self._insert_history(conn, activity['id'], activity['history'])
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)",
+                         (str(data.get('next_id', 1)),))
+            self._bump_version(conn)
+
+    def add_activity(self, activity):
+        """Assign the next id to activity, store it and return the stored record"""
+        with self._transaction() as conn:
+            next_id = self._next_id(conn)
+            activity = {'id': next_id, **activity, 'version': 1}
+            self._write_activity(conn, activity)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)",
+                         (str(next_id + 1),))
+            self._bump_version(conn)
+        return activity
+
+    def add_activities(self, activities):
+        """Assign consecutive ids to new activities and store them in one transaction"""
+        stored = []
+        with self._transaction() as conn:
+            next_id = self._next_id(conn)
+            for activity in activities:
+                activity = {'id': next_id, **activity, 'version': 1}
+                self._write_activity(conn, activity)
+                stored.append(activity)
+                next_id += 1
+            if stored:
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)",
+                             (str(next_id),))
+                self._bump_version(conn)
+        return stored
+
+    def update_activity(self, activity, op='edit'):
+        """Persist an activity previously returned by get_activity()
+
+        Raises ConflictError if the stored version moved on since it was read.
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT version FROM activities WHERE id = ?', (activity['id'],)).fetchone()
+            if row is None:
+                raise KeyError(activity['id'])
+            expected = activity.get('version', 0)
+            if row['version'] != expected:
+                raise ConflictError(activity['id'], expected, row['version'])
+            activity = {**activity, 'version': expected + 1}
+            self._write_activity(conn, activity)
+            self._bump_version(conn)
+        return activity
+
+    def update_activities(self, activities, op='status'):
+        """Persist several activities from get_activity() in one transaction
+
+        All or nothing: raises ConflictError if any stored version moved on.
+        """
+        stored = []
+        with self._transaction() as conn:
+            for activity in activities:
+                row = conn.execute(
+                    'SELECT version FROM activities WHERE id = ?', (activity['id'],)).fetchone()
+                if row is None:
+                    raise KeyError(activity['id'])
+                expected = activity.get('version', 0)
+                if row['version'] != expected:
+                    raise ConflictError(activity['id'], expected, row['version'])
+                activity = {**activity, 'version': expected + 1}
+                self._write_activity(conn, activity)
+                stored.append(activity)
+            if stored:
+                self._bump_version(conn)
+        return stored
+
+    def delete_activity(self, activity_id):
+        """Remove an activity; returns False if it did not exist"""
+        with self._transaction() as conn:
+            cursor = conn.execute('DELETE FROM activities WHERE id = ?', (activity_id,))
+            if cursor.rowcount == 0:
+                return False
+            self._bump_version(conn)
+            return True
+
+    def append_history(self, activity_id, entry):
+        """Append an entry to the history of an activity"""
+        with self._transaction() as conn:
+            self._insert_history(conn, activity_id, [entry])
+
+    def append_history_batch(self, entries):
+        """Append one entry to each of several histories: [(activity_id, entry), ...]"""
+        with self._transaction() as conn:
+            for activity_id, entry in entries:
+                self._insert_history(conn, activity_id, [entry])
+
+    def get_history(self, activity_id, offset=0, limit=None):
+        """Return (entries newest first, total count) for one page of history"""
+        conn = self._connection()
+        total = conn.execute(
+            'SELECT COUNT(*) FROM history WHERE activity_id = ?', (activity_id,)).fetchone()[0]
+        rows = conn.execute(
+            'SELECT timestamp, action, user, comment FROM history WHERE activity_id = ? '
+            'ORDER BY id DESC LIMIT ? OFFSET ?',
+            (activity_id, -1 if limit is None else limit, offset))
+        return [dict(row) for row in rows], total
@@ -9,6 +9,11 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeFormValidation();
     initializeCardAnimations();
     initializeNavigation();
+    initializeStatusModal();
+    initializeEditModal();
+    initializeInPlaceForms();
+    initializeBulkUpdate();
+    initializeLiveUpdates();
     
     // Auto-hide alerts after 5 seconds
     setTimeout(hideAlerts, 5000);
@@ -168,6 +173,506 @@ function initializeNavigation() {
     });
 }
 
+/**
+ * Fill the shared dashboard status modal from the clicked cell
+ *
+ * The cell carries the form URL and the person's current status; the row
+ * carries the activity title and its responsibles.
+ */
+function initializeStatusModal() {
+    const modal = document.getElementById('statusModal');
+    if (!modal) {
+        return;
+    }
+    
+    const form = modal.querySelector('form');
+    const statusEmojis = JSON.parse(modal.dataset.statusEmojis);
+    const justificationField = modal.querySelector('#justification_field');
+    const field = name => modal.querySelector(`[data-field="${name}"]`);
+    
+    function toggleJustification(status) {
+        justificationField.style.display = status === 'Pendente' ? 'block' : 'none';
+    }
+    
+    modal.addEventListener('show.bs.modal', function(event) {
+        const cell = event.relatedTarget;
+        if (!cell) {
+            return;
+        }
+        const row = cell.closest('tr');
+        const responsible = JSON.parse(row.dataset.responsible);
+        const status = cell.dataset.status;
+        const info = statusEmojis[status];
+        
+        form.action = cell.dataset.url;
+        field('title').textContent = row.dataset.title.slice(0, 30);
+        field('person').textContent = cell.dataset.person;
+        field('responsible').textContent = responsible.join(', ');
+        field('multiple-info').style.display = responsible.length > 1 ? '' : 'none';
+        field('multiple-warning').style.display = responsible.length > 1 ? '' : 'none';
+        
+        const badge = field('current-status');
+        badge.className = `badge bg-${info.color}`;
+        badge.textContent = `${info.emoji} ${status}`;
+        
+        form.querySelectorAll('input[name="status"]').forEach(radio => {
+            radio.checked = radio.value === status;
+        });
+        form.elements['status_comment'].value = cell.dataset.comment;
+        form.elements['justification'].value = cell.dataset.justification;
+        toggleJustification(status);
+    });
+    
+    form.querySelectorAll('input[name="status"]').forEach(radio => {
+        radio.addEventListener('change', function() {
+            toggleJustification(this.value);
+        });
+    });
+}
+
+/**
+ * Fill the shared dashboard edit modal from the clicked edit button
+ */
+function initializeEditModal() {
+    const modal = document.getElementById('editModal');
+    if (!modal) {
+        return;
+    }
+    
+    const form = modal.querySelector('form');
+    
+    modal.addEventListener('show.bs.modal', function(event) {
+        const button = event.relatedTarget;
+        if (!button) {
+            return;
+        }
+        const responsible = JSON.parse(button.dataset.responsible);
+        
+        form.action = button.dataset.url;
+        modal.querySelector('[data-field="activity-id"]').textContent = button.dataset.activityId;
+        form.elements['version'].value = button.dataset.version;
+        form.elements['title'].value = button.dataset.title;
+        form.elements['description'].value = button.dataset.description;
+        form.elements['deadline'].value = button.dataset.deadline;
+        Array.from(form.elements['responsible'].options).forEach(option => {
+            option.selected = responsible.includes(option.value);
+        });
+    });
+}
+
+/**
+ * Update the dashboard header counters and the pending count per manager
+ */
+function updateDashboardCounters(counters) {
+    const total = document.querySelector('[data-counter="total"]');
+    if (total) {
+        total.textContent = counters.total;
+    }
+    document.querySelectorAll('[data-counter]:not([data-counter="total"])').forEach(counter => {
+        counter.textContent = counters.overall[counter.dataset.counter] || 0;
+    });
+    document.querySelectorAll('[data-pending-for]').forEach(badge => {
+        const pending = (counters.by_responsible[badge.dataset.pendingFor] || {})['Pendente'] || 0;
+        badge.querySelector('span').textContent = pending;
+        badge.hidden = !pending;
+    });
+}
+
+/**
+ * Patch an activity's dashboard rows after a status change
+ *
+ * data is the JSON answer of a status or justification post, or a change
+ * event: the activity's version, per-person status, overall status and the
+ * dashboard counters. Rows that are already at that version are left alone.
+ */
+function applyActivityState(data) {
+    const modal = document.getElementById('statusModal');
+    if (!modal) {
+        return;
+    }
+    const statusEmojis = JSON.parse(modal.dataset.statusEmojis);
+    updateDashboardCounters(data.counters);
+    
+    // Justifications waiting for a decision that no longer are
+    document.querySelectorAll(`[data-justification-for="${data.id}"]`).forEach(item => {
+        const state = data.responsible_status[item.dataset.person];
+        if (!state || state.status !== 'Pendente' || !state.justification || state.justification_approved) {
+            item.remove();
+        }
+    });
+    
+    const rows = document.querySelectorAll(`tr[data-activity-id="${data.id}"]`);
+    if (!rows.length || parseInt(rows[0].dataset.version) >= data.version) {
+        return;
+    }
+    const overall = statusEmojis[data.overall_status];
+    rows.forEach(row => {
+        row.dataset.version = data.version;
+        row.querySelectorAll('.overall-status').forEach(badge => {
+            Array.from(badge.classList)
+                .filter(name => name.startsWith('bg-'))
+                .forEach(name => badge.classList.remove(name));
+            badge.classList.add(`bg-${overall.color}`);
+            badge.textContent = `${overall.emoji} ${data.overall_status}`;
+        });
+        
+        // Matrix cells, one per responsible
+        row.querySelectorAll('.emoji-status').forEach(cell => {
+            const state = data.responsible_status[cell.dataset.person];
+            if (!state) {
+                return;
+            }
+            const comment = state.comment || '';
+            cell.dataset.status = state.status;
+            cell.dataset.comment = comment;
+            cell.dataset.justification = state.justification || '';
+            cell.textContent = statusEmojis[state.status].emoji;
+            cell.closest('td').style.backgroundColor = statusEmojis[state.status].bg;
+            cell.parentNode.querySelector('.status-comment').textContent =
+                comment.length > 15 ? `${comment.slice(0, 15)}...` : comment;
+        });
+        
+        // List comments column
+        const comments = row.querySelector('.status-comments');
+        if (comments) {
+            comments.replaceChildren();
+            Object.entries(data.responsible_status).forEach(([person, state]) => {
+                if (state.comment) {
+                    const line = document.createElement('small');
+                    line.className = 'text-muted d-block';
+                    line.textContent = `${person}: ${state.comment}`;
+                    comments.appendChild(line);
+                }
+            });
+            if (!comments.children.length) {
+                comments.innerHTML = '<small class="text-muted">-</small>';
+            }
+        }
+        
+        const editButton = row.querySelector('[data-bs-target="#editModal"]');
+        if (editButton) {
+            editButton.dataset.version = data.version;
+        }
+    });
+}
+
+/**
+ * Submit dashboard status and justification forms without leaving the page
+ *
+ * The server answers fetch calls with the activity's new state, which is
+ * patched into the grid. Without fetch, or if the request cannot be sent,
+ * the form is posted normally and the server redirects back.
+ */
+function initializeInPlaceForms() {
+    if (!window.fetch) {
+        return;
+    }
+    
+    document.querySelectorAll('form[data-in-place]').forEach(form => {
+        form.addEventListener('submit', function(event) {
+            event.preventDefault();
+            const body = new FormData(form);
+            // Approve and reject are the names of the submit buttons
+            const submitter = event.submitter;
+            if (submitter && submitter.name) {
+                body.append(submitter.name, submitter.value);
+            }
+            
+            function postNormally() {
+                if (submitter && submitter.name) {
+                    const input = document.createElement('input');
+                    input.type = 'hidden';
+                    input.name = submitter.name;
+                    input.value = submitter.value;
+                    form.appendChild(input);
+                }
+                form.submit();
+            }
+            
+            fetch(form.action, { method: 'POST', body: body, headers: { 'Accept': 'application/json' } })
+                .then(response => {
+                    if (!(response.headers.get('Content-Type') || '').includes('application/json')) {
+                        // Not an answer from the endpoint (e.g. a login page): show what the server has
+                        window.location.reload();
+                        return;
+                    }
+                    return response.json().then(data => {
+                        if (!response.ok) {
+                            showToast(data.error, 'danger');
+                            return;
+                        }
+                        applyActivityState(data);
+                        const modal = form.closest('.modal');
+                        if (modal) {
+                            bootstrap.Modal.getOrCreateInstance(modal).hide();
+                        }
+                        showToast(data.message, 'success');
+                    });
+                }, postNormally);
+        });
+    });
+}
+
+/**
+ * Select many matrix cells and give them one status in a single request
+ *
+ * In selection mode a click on a cell toggles it instead of opening the
+ * status modal; a click on a manager header or an activity toggles the
+ * whole column or row. Each update carries the version of its row, so a
+ * stale page gets a conflict instead of overwriting newer changes.
+ */
+function initializeBulkUpdate() {
+    const toolbar = document.querySelector('[data-bulk-toolbar]');
+    const modal = document.getElementById('bulkModal');
+    if (!toolbar || !modal || !window.fetch) {
+        return;
+    }
+    
+    const table = document.querySelector('.dashboard-grid');
+    const form = modal.querySelector('form');
+    const control = name => toolbar.querySelector(`[data-bulk="${name}"]`);
+    const justificationField = modal.querySelector('[data-field="justification"]');
+    let active = false;
+    
+    const selectedCells = () => table.querySelectorAll('td.bulk-selected .emoji-status');
+    
+    function refresh() {
+        const count = selectedCells().length;
+        control('count').textContent = count;
+        control('apply').disabled = count === 0;
+        control('clear').disabled = count === 0;
+    }
+    
+    // Select all the given cells, or unselect them if they all already are
+    function toggleCells(cells) {
+        const tds = Array.from(cells).map(cell => cell.closest('td'));
+        const select = !tds.every(td => td.classList.contains('bulk-selected'));
+        tds.forEach(td => td.classList.toggle('bulk-selected', select));
+        refresh();
+    }
+    
+    function clearSelection() {
+        table.querySelectorAll('td.bulk-selected').forEach(td => td.classList.remove('bulk-selected'));
+        refresh();
+    }
+    
+    control('toggle').addEventListener('click', function() {
+        active = !active;
+        this.classList.toggle('active', active);
+        table.classList.toggle('bulk-mode', active);
+        control('hint').hidden = !active;
+        if (!active) {
+            clearSelection();
+        }
+    });
+    control('clear').addEventListener('click', clearSelection);
+    
+    // Capture clicks before Bootstrap opens the single-cell status modal
+    table.addEventListener('click', function(event) {
+        if (!active) {
+            return;
+        }
+        const cell = event.target.closest('.emoji-status');
+        const header = event.target.closest('th.manager-col');
+        const activity = event.target.closest('td.activity-info');
+        if (cell) {
+            toggleCells([cell]);
+        } else if (header) {
+            const person = header.querySelector('.fw-bold').textContent.trim();
+            toggleCells(table.querySelectorAll(`.emoji-status[data-person="${CSS.escape(person)}"]`));
+        } else if (activity) {
+            toggleCells(activity.closest('tr').querySelectorAll('.emoji-status'));
+        } else {
+            return;
+        }
+        event.preventDefault();
+        event.stopPropagation();
+    }, true);
+    
+    modal.addEventListener('show.bs.modal', function() {
+        modal.querySelector('[data-field="count"]').textContent = selectedCells().length;
+    });
+    form.querySelectorAll('input[name="status"]').forEach(radio => {
+        radio.addEventListener('change', function() {
+            justificationField.style.display = this.value === 'Pendente' ? 'block' : 'none';
+        });
+    });
+    
+    form.addEventListener('submit', function(event) {
+        event.preventDefault();
+        const status = form.elements['status'].value;
+        const updates = Array.from(selectedCells()).map(cell => {
+            const row = cell.closest('tr');
+            return {
+                activity_id: parseInt(row.dataset.activityId),
+                version: parseInt(row.dataset.version),
+                person: cell.dataset.person,
+                status: status,
+                comment: form.elements['status_comment'].value,
+                justification: form.elements['justification'].value
+            };
+        });
+        
+        fetch(form.action, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+            body: JSON.stringify({ updates: updates })
+        })
+            .then(response => response.json().then(data => {
+                if (!response.ok) {
+                    showToast(data.error, 'danger');
+                    return;
+                }
+                data.activities.forEach(activity => {
+                    applyActivityState({ ...activity, counters: data.counters });
+                });
+                bootstrap.Modal.getOrCreateInstance(modal).hide();
+                form.reset();
+                justificationField.style.display = 'none';
+                clearSelection();
+                showToast(data.message, 'success');
+            }))
+            .catch(error => {
+                console.error('Erro na atualização em lote:', error);
+                showToast('Erro ao atualizar status.', 'danger');
+            });
+    });
+}
+
+/**
+ * Follow the server's change events and patch the open page in place
+ *
+ * The dashboard patches status changes from the event itself and replaces
+ * the rows of created or edited activities (fetched already rendered from
+ * the server); the
+ * activity list removes cards that are gone and offers a reload for other
+ * changes.
+ * EventSource reconnects by itself and resumes from the last event it saw.
+ * If the server has no stream to spare, the page polls the data version.
+ */
+function initializeLiveUpdates() {
+    const page = document.querySelector('[data-live]');
+    if (!page || !window.EventSource) {
+        return;
+    }
+    
+    const source = new EventSource(page.dataset.eventsUrl);
+    const isDashboard = page.dataset.live === 'dashboard';
+    const rowsOf = id => page.querySelectorAll(`tr[data-activity-id="${id}"]`);
+    
+    // Events this page already reflects (its rows are at least as new)
+    function isCurrent(data) {
+        const element = page.querySelector(`[data-activity-id="${data.id}"]`);
+        return element && data.version !== undefined &&
+            parseInt(element.dataset.version) >= data.version;
+    }
+    
+    function replaceRows(id) {
+        fetch(page.dataset.rowsUrl.replace(/0$/, id), { headers: { 'Accept': 'application/json' } })
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(rows => {
+                const [matrixRow, listRow] = rowsOf(id);
+                if (!matrixRow || !listRow) {
+                    // New activity: add it at the end of both tables
+                    const [matrixBody, listBody] = page.querySelectorAll('table tbody');
+                    if (!matrixBody || !listBody) {
+                        return;
+                    }
+                    matrixBody.insertAdjacentHTML('beforeend', rows.matrix);
+                    listBody.insertAdjacentHTML('beforeend', rows.list);
+                    return;
+                }
+                if (parseInt(matrixRow.dataset.version) < rows.version) {
+                    matrixRow.outerHTML = rows.matrix;
+                    listRow.outerHTML = rows.list;
+                }
+            })
+            .catch(error => console.error('Erro ao atualizar atividade:', error));
+    }
+    
+    function handleDashboard(type, data) {
+        if (type === 'import') {
+            updateDashboardCounters(data.counters);
+            showToast('Novas atividades foram importadas.', 'info', true);
+        } else if (type === 'delete') {
+            updateDashboardCounters(data.counters);
+            rowsOf(data.id).forEach(row => row.remove());
+            page.querySelectorAll(`[data-justification-for="${data.id}"]`).forEach(item => item.remove());
+        } else if (type === 'create' || type === 'edit') {
+            updateDashboardCounters(data.counters);
+            if (!isCurrent(data)) {
+                replaceRows(data.id);
+            }
+        } else {
+            applyActivityState(data);
+        }
+    }
+    
+    function handleIndex(type, data) {
+        if (type === 'import') {
+            showToast('Novas atividades foram importadas.', 'info', true);
+            return;
+        }
+        const card = page.querySelector(`[data-activity-id="${data.id}"]`);
+        const user = page.dataset.user;
+        // Events of activities this user cannot see carry only the id
+        const responsible = data.responsible || [];
+        if (type === 'delete' || (card && user && !responsible.includes(user))) {
+            if (card) {
+                card.remove();
+            }
+            return;
+        }
+        if (card ? isCurrent(data) : type !== 'create' || (user && !responsible.includes(user))) {
+            return;
+        }
+        const message = type === 'create' ? `Nova atividade: ${data.title}` : `Atividade #${data.id} foi atualizada`;
+        showToast(message, 'info', true);
+    }
+    
+    ['create', 'edit', 'status', 'approve', 'reject', 'delete', 'import'].forEach(type => {
+        source.addEventListener(type, function(event) {
+            const data = JSON.parse(event.data);
+            if (isDashboard) {
+                handleDashboard(type, data);
+            } else {
+                handleIndex(type, data);
+            }
+        });
+    });
+    
+    // The server could not resume from our last event: start over
+    source.addEventListener('reset', function() {
+        window.location.reload();
+    });
+    
+    // A worker that has all its streams open refuses new ones (503), which
+    // closes the source for good: look for changes now and then instead
+    source.addEventListener('error', function() {
+        if (source.readyState === EventSource.CLOSED) {
+            pollDataVersion(page);
+        }
+    });
+}
+
+/**
+ * Fallback for pages without a live stream: offer a reload once the data
+ * is newer than the version the page was rendered from
+ */
+function pollDataVersion(page) {
+    const timer = setInterval(function() {
+        fetch(page.dataset.versionUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(data => {
+                if (data.version > parseInt(page.dataset.dataVersion)) {
+                    clearInterval(timer);
+                    showToast('Os dados foram atualizados.', 'info', true);
+                }
+            })
+            .catch(error => console.error('Erro ao verificar atualizações:', error));
+    }, 30000);
+}
+
 /**
  * Hide alert messages automatically
  */
@@ -248,15 +753,16 @@ function confirmAction(message, callback) {
 
 /**
  * Show toast notification
+ *
+ * The message is inserted as text (it may hold activity titles typed by
+ * users); withReload adds a link that reloads the page.
  */
-function showToast(message, type = 'info') {
+function showToast(message, type = 'info', withReload = false) {
     // Create toast element
     const toastHtml = `
         <div class="toast align-items-center text-white bg-${type} border-0" role="alert" aria-live="assertive" aria-atomic="true">
             <div class="d-flex">
-                <div class="toast-body">
-                    ${message}
-                </div>
+                <div class="toast-body"></div>
                 <button type="button" class="btn-close btn-close-white me-2 m-auto" data-bs-dismiss="toast" aria-label="Close"></button>
             </div>
         </div>
@@ -273,8 +779,14 @@ function showToast(message, type = 'info') {
     // Add toast to container
     toastContainer.insertAdjacentHTML('beforeend', toastHtml);
     
-    // Initialize and show toast
     const toastElement = toastContainer.lastElementChild;
+    const body = toastElement.querySelector('.toast-body');
+    body.textContent = message;
+    if (withReload) {
+        body.insertAdjacentHTML('beforeend', ' <a href="" class="text-white fw-bold ms-1">Recarregar</a>');
+    }
+    
+    // Initialize and show toast
     const toast = new bootstrap.Toast(toastElement);
     toast.show();
     
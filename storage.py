@@ -0,0 +1,699 @@
+import os
+import copy
+import logging
+import threading
+from datetime import datetime
+from collections import Counter
+from contextlib import contextmanager
+
+import metrics
+import serialization
+from history import HistoryStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+
+def file_signature(path):
+    """Return (mtime_ns, size, inode) for path, or None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def fsync_directory(path):
+    """Make the renames and creations of files in the directory of path durable"""
+    try:
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    except OSError:  # Windows cannot open a directory
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ConflictError(Exception):
+    """Raised when an activity was changed by someone else since it was read"""
+
+    def __init__(self, activity_id, expected_version, current_version):
+        super().__init__(f'Activity {activity_id} is at version {current_version}, '
+                         f'expected {expected_version}')
+        self.activity_id = activity_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+
+
+def responsible_list(activity):
+    """Return the responsibles of an activity as a list (older records store a string)"""
+    responsible = activity.get('responsible', [])
+    if isinstance(responsible, str):
+        return [responsible]
+    return responsible
+
+
+@metrics.timed(metrics.STATUS_COMPUTE_DURATION)
+def get_activity_overall_status(activity):
+    """Calculate overall activity status based on individual statuses"""
+    if 'responsible_status' not in activity or not activity['responsible_status']:
+        return 'Pendente'
+    
+    statuses = [s.get('status', 'Pendente') for s in activity['responsible_status'].values()]
+    
+    if not statuses:
+        return 'Pendente'
+    
+    # If all completed, activity is completed
+    if all(s == 'Concluída' for s in statuses):
+        return 'Concluída'
+    
+    # If all cancelled or NA, activity is cancelled
+    if all(s in ['Cancelada', 'Não Aplicável'] for s in statuses):
+        return 'Cancelada'
+    
+    # If any in progress, activity is in progress
+    if any(s == 'Em Andamento' for s in statuses):
+        return 'Em Andamento'
+    
+    # Otherwise, pending
+    return 'Pendente'
+
+
+def normalize_activity(activity):
+    """Bring an activity record to the current layout, in place
+
+    Older records store a single responsible as a string and may lack a
+    responsible_status entry for some responsibles. overall_status is
+    derived from responsible_status and recomputed every time the record
+    is written, so pages read it instead of computing it.
+    """
+    responsible = responsible_list(activity)
+    activity['responsible'] = responsible
+    statuses = activity.setdefault('responsible_status', {})
+    for person in responsible:
+        if person not in statuses:
+            statuses[person] = {
+                'status': 'Pendente',
+                'comment': '',
+                'justification': '',
+                'justification_approved': False
+            }
+    activity['overall_status'] = get_activity_overall_status(activity)
+    return activity
+
+
+def validate_activity_fields(title, description, deadline, responsible, managers):
+    """Return the error message for invalid activity fields, or None"""
+    if not all([title, description, deadline]) or not responsible:
+        return 'Todos os campos são obrigatórios.'
+    for resp in responsible:
+        if resp not in managers:
+            return 'Responsável inválido.'
+    return None
+
+
+def new_activity_record(title, description, deadline, responsible, created_by):
+    """Build a new activity with every responsible pending"""
+    # Initialize individual status for each responsible
+    responsible_status = {}
+    for person in responsible:
+        responsible_status[person] = {
+            'status': 'Pendente',
+            'comment': '',
+            'justification': '',
+            'justification_approved': False
+        }
+    
+    return {
+        'title': title,
+        'description': description,
+        'deadline': deadline,
+        'responsible': responsible,
+        'responsible_status': responsible_status,
+        'created_by': created_by,
+        'created_at': datetime.now().isoformat()
+    }
+
+
+def open_store(backend, json_path, sqlite_path, data_format='json'):
+    """Create the activity store selected by the STORAGE_BACKEND setting"""
+    if backend == 'sqlite':
+        from sqlite_store import SQLiteActivityStore
+        return SQLiteActivityStore(sqlite_path)
+    if backend != 'json':
+        raise ValueError(f'Unknown storage backend: {backend}')
+    store = ActivityStore(json_path, data_format=data_format)
+    store.migrate_embedded_history()
+    return store
+
+
+# Journal records accumulated before the snapshot is rewritten in the background
+COMPACT_THRESHOLD = 500
+
+
+class ActivityStore:
+    """In-process cache of the activities document.
+
+    The parsed document is kept in memory and the file is parsed again only
+    when its signature (mtime, size, inode) changes, so a read is a stat call
+    instead of a full parse. The snapshot is written in data_format (one of
+    serialization.FORMATS); reading detects the format, so switching formats
+    only takes effect on the next snapshot write.
+
+    Mutations are not written to the snapshot file. Each one is appended as a
+    single JSON line to a journal next to it (create, status, approve, reject,
+    edit, delete) and fsynced, so the cost of a write does not depend on the
+    size of the dataset; a bulk status change is a single record holding
+    every activity it touches. Every record carries a sequence number; the snapshot
+    stores the last sequence folded into it, and loading replays the journal
+    records that come after it. Once the journal grows past
+    compact_threshold records it is folded into a new snapshot by a
+    background thread.
+
+    Several worker processes can share the files. Every activity carries a
+    version counter; a commit takes an exclusive lock on a lock file, catches
+    up with the journal and appends the changed activity only if its version
+    still matches the one it was read at, otherwise ConflictError is raised.
+    Writes to different activities never overwrite each other.
+
+    In memory the activities are kept in a dict keyed by id (in insertion
+    order, which is id order), so single-activity reads, updates and deletes
+    do not scan or copy the whole list. A second index maps each responsible
+    to the ids of their activities, for per-user lists and counts. Counters
+    of overall status and of person x status are adjusted as records are
+    put and removed, so the dashboard totals never scan the activities.
+
+    Activity history is not part of the records; it lives in a HistoryStore
+    (data/history/<id>.jsonl) and is read only through get_history().
+    """
+
+    def __init__(self, path, journal_path=None, compact_threshold=COMPACT_THRESHOLD,
+                 history_dir=None, data_format='json'):
+        if data_format not in serialization.FORMATS:
+            raise ValueError(f'Unknown data format: {data_format}')
+        self.path = path
+        self.data_format = data_format
+        self.history = HistoryStore(history_dir or os.path.join(os.path.dirname(path), 'history'))
+        self.journal_path = journal_path or os.path.splitext(path)[0] + '.journal'
+        self.lock_path = os.path.splitext(path)[0] + '.lock'
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._activities = None
+        self._by_responsible = {}
+        self._status_counts = Counter()
+        self._person_status_counts = Counter()
+        self._next_id = 1
+        self._seq = 0
+        self._signature = None
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._compacting = False
+        self._lock_file = None
+        self._lock_depth = 0
+
+    @contextmanager
+    def _commit_lock(self):
+        """Serialize writers across threads and processes (re-entrant)
+
+        Readers only wait on self._lock, which writers take after this one,
+        so waiting for another process does not stall page loads.
+        """
+        with self._write_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_file = open(self.lock_path, 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def load(self):
+        """Return the whole document, catching up with the snapshot and journal on disk"""
+        with self._lock:
+            self._catch_up()
+            return self._document()
+
+    def _document(self):
+        return {
+            "activities": list(self._activities.values()),
+            "next_id": self._next_id,
+            "seq": self._seq
+        }
+
+    def _catch_up(self):
+        if self._activities is None or file_signature(self.path) != self._signature:
+            self._read_snapshot()
+        if not self._read_journal():
+            # The journal was compacted or rewritten under us: start over
+            self._read_snapshot()
+            self._read_journal()
+
+    def _index(self):
+        """Catch up and return the id -> activity index used by the read methods
+
+        Falls back to an empty index if the snapshot cannot be parsed, so the
+        pages still render.
+        """
+        with self._lock:
+            try:
+                self._catch_up()
+            except serialization.DecodeError as e:
+                logging.error(f"Error loading data: {e}")
+                return {}
+            return self._activities
+
+    @metrics.timed(metrics.DATA_OPERATION_DURATION, 'load_snapshot')
+    def _read_snapshot(self):
+        try:
+            with open(self.path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                data = serialization.loads(f.read())
+            signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+            metrics.DATA_READ_BYTES.inc(st.st_size, 'activities')
+        except FileNotFoundError:
+            data = {"activities": [], "next_id": 1}
+            signature = None
+
+        self._set_activities(data['activities'])
+        self._next_id = data.get('next_id', 1)
+        self._seq = data.get('seq', 0)
+        self._signature = signature
+        self._journal_ino = None
+        self._journal_offset = 0
+        self._journal_records = 0
+
+    @metrics.timed(metrics.DATA_OPERATION_DURATION, 'load_journal')
+    def _read_journal(self):
+        """Apply journal records appended since the last read.
+
+        Returns False if the journal no longer lines up with the cached
+        document, in which case the caller reloads from the snapshot.
+        """
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return self._journal_ino is None
+
+        with f:
+            st = os.fstat(f.fileno())
+            if self._journal_ino is None:
+                self._journal_ino = st.st_ino
+            elif st.st_ino != self._journal_ino or st.st_size < self._journal_offset:
+                return False
+
+            if st.st_size == self._journal_offset:
+                return True
+
+            f.seek(self._journal_offset)
+            chunk = f.read(st.st_size - self._journal_offset)
+        metrics.DATA_READ_BYTES.inc(len(chunk), 'journal')
+
+        # A record is only complete once its newline is on disk
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = serialization.loads(line)
+            except serialization.DecodeError:
+                return False
+            if record['seq'] <= self._seq:
+                continue
+            if record['seq'] != self._seq + 1:
+                return False
+            self._apply(record)
+            self._journal_records += 1
+
+        self._journal_offset += end
+        return True
+
+    def _set_activities(self, activities):
+        self._activities = {}
+        self._by_responsible = {}
+        self._status_counts = Counter()
+        self._person_status_counts = Counter()
+        for activity in activities:
+            self._put(activity)
+
+    def _put(self, activity):
+        """Insert or replace an activity in the indexes and counters (keeping its position)"""
+        normalize_activity(activity)
+        previous = self._activities.get(activity['id'])
+        if previous is not None:
+            self._untrack(previous)
+        self._activities[activity['id']] = activity
+        for person in activity['responsible']:
+            self._by_responsible.setdefault(person, set()).add(activity['id'])
+        self._status_counts[activity['overall_status']] += 1
+        for person, info in activity['responsible_status'].items():
+            self._person_status_counts[person, info.get('status', 'Pendente')] += 1
+
+    def _remove(self, activity_id):
+        """Drop an activity from the indexes and counters"""
+        activity = self._activities.pop(activity_id, None)
+        if activity is not None:
+            self._untrack(activity)
+
+    def _untrack(self, activity):
+        for person in activity['responsible']:
+            ids = self._by_responsible.get(person)
+            if ids is not None:
+                ids.discard(activity['id'])
+                if not ids:
+                    del self._by_responsible[person]
+        self._status_counts[activity['overall_status']] -= 1
+        for person, info in activity['responsible_status'].items():
+            self._person_status_counts[person, info.get('status', 'Pendente')] -= 1
+
+    def _apply(self, record):
+        """Apply one journal record to the cached indexes"""
+        if record['op'] == 'delete':
+            self._remove(record['id'])
+        elif 'activities' in record:
+            # Bulk change: several activities committed as one record
+            for activity in record['activities']:
+                self._put(activity)
+        else:
+            self._put(record['activity'])
+        if 'next_id' in record:
+            self._next_id = max(self._next_id, record['next_id'])
+        self._seq = record['seq']
+
+    @metrics.timed(metrics.DATA_OPERATION_DURATION, 'append_journal')
+    def _append(self, op, activity_id, activity=None, next_id=None, activities=None):
+        """Write one mutation record to the journal and apply it to the cache
+
+        A bulk change passes activities instead of activity_id/activity, so
+        the whole batch is one line and lands (or not) as a unit. Called
+        with the commit lock held but not self._lock: readers in this process
+        keep being served while the record is written and fsynced, and the
+        cache is only locked to apply it.
+        """
+        record = {'seq': self._seq + 1, 'op': op, 'id': activity_id}
+        if activity is not None:
+            record['activity'] = normalize_activity(activity)
+        if activities is not None:
+            record['activities'] = [normalize_activity(activity) for activity in activities]
+        if next_id is not None:
+            record['next_id'] = next_id
+        # Journal records are always single-line compact JSON
+        line = serialization.dumps(record, 'json') + b'\n'
+
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            metrics.DATA_WRITTEN_BYTES.inc(len(line), 'journal')
+            os.fsync(fd)
+            st = os.fstat(fd)
+        finally:
+            os.close(fd)
+
+        with self._lock:
+            # A reader may have caught up with the journal, record included,
+            # while it was being fsynced
+            if record['seq'] > self._seq:
+                # Skip re-reading our own record unless someone else appended meanwhile
+                if (self._journal_ino in (None, st.st_ino)
+                        and st.st_size == self._journal_offset + len(line)):
+                    self._journal_ino = st.st_ino
+                    self._journal_offset = st.st_size
+                self._apply(record)
+                self._journal_records += 1
+            if self._journal_records >= self.compact_threshold:
+                self._schedule_compaction()
+
+    def _schedule_compaction(self):
+        if self._compacting:
+            return
+        self._compacting = True
+        threading.Thread(target=self.compact, name='journal-compaction', daemon=True).start()
+
+    def compact(self):
+        """Fold the journal into a new snapshot"""
+        try:
+            with self._commit_lock(), self._lock:
+                self._catch_up()
+                if self._journal_records:
+                    self._write_snapshot(self._document())
+        except Exception as e:
+            logging.error(f"Error compacting activities journal: {e}")
+        finally:
+            self._compacting = False
+
+    def save(self, data):
+        """Write the whole document as the new snapshot and empty the journal
+
+        Replacing the document counts as one more change, so data_version()
+        moves forward even if the caller passes back an older 'seq'.
+        """
+        with self._commit_lock(), self._lock:
+            try:
+                self._catch_up()
+            except serialization.DecodeError:
+                pass
+            data['seq'] = max(data.get('seq', 0), self._seq) + 1
+            self._write_snapshot(data)
+
+    @metrics.timed(metrics.DATA_OPERATION_DURATION, 'save_snapshot')
+    def _write_snapshot(self, data):
+        """Write data as the snapshot and empty the journal (under the commit lock)"""
+        with self._commit_lock(), self._lock:
+            tmp_path = f'{self.path}.tmp'
+            try:
+                # Indexing normalizes the records, so do it before writing them
+                self._set_activities(data.get('activities', []))
+                payload = serialization.dumps(data, self.data_format)
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                metrics.DATA_WRITTEN_BYTES.inc(len(payload), 'activities')
+                # Records up to data['seq'] are now part of the snapshot; the
+                # journal is only emptied once the new snapshot is on disk
+                fsync_directory(self.path)
+                if os.path.exists(self.journal_path):
+                    os.truncate(self.journal_path, 0)
+            except Exception:
+                # The in-memory copy may hold changes that never reached disk
+                self.invalidate()
+                raise
+
+            self._next_id = data.get('next_id', 1)
+            self._seq = data.get('seq', 0)
+            self._signature = file_signature(self.path)
+            self._journal_ino = None
+            self._journal_offset = 0
+            self._journal_records = 0
+
+    def data_version(self):
+        """Return a number that changes whenever any activity changes"""
+        with self._lock:
+            self._index()
+            return self._seq
+
+    def snapshot_to(self, path):
+        """Write a point-in-time copy of the activities to path, for backups
+
+        Stored records are never modified in place (a change puts a new
+        record), so the document taken under the read lock stays consistent
+        with its 'seq' while writers carry on; it is serialized after the
+        lock is released. The copy is a single snapshot file with the
+        journal folded in. Returns the data version it holds.
+        """
+        data = self.load()
+        payload = serialization.dumps(data, self.data_format)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return data['seq']
+
+    def modified_time(self):
+        """Return the time of the last write to the snapshot or journal (epoch seconds)"""
+        times = [0]
+        for path in (self.path, self.journal_path):
+            try:
+                times.append(os.stat(path).st_mtime)
+            except FileNotFoundError:
+                pass
+        return max(times)
+
+    def invalidate(self):
+        """Drop the cached copy so the next load() reads the files again"""
+        with self._lock:
+            self._activities = None
+            self._signature = None
+
+    def get_activity(self, activity_id):
+        """Return a private copy of the activity with the given id, or None
+
+        The copy can be modified and handed back to update_activity(); its
+        version field is what the commit is checked against.
+        """
+        with self._lock:
+            activity = self._index().get(activity_id)
+            return copy.deepcopy(activity) if activity is not None else None
+
+    def list_activities(self, responsible=None):
+        """Return all activities, or only those assigned to responsible (read-only)"""
+        with self._lock:
+            activities = self._index()
+            if responsible is None:
+                return list(activities.values())
+            # The index is empty when the snapshot cannot be parsed, the by-responsible one is not
+            ids = self._by_responsible.get(responsible, ())
+            return [activities[activity_id] for activity_id in sorted(ids) if activity_id in activities]
+
+    def add_activity(self, activity):
+        """Assign the next id to activity, store it and return the stored record"""
+        with self._commit_lock():
+            with self._lock:
+                self._catch_up()
+                activity = {'id': self._next_id, **activity, 'version': 1}
+            self._append('create', activity['id'], activity, next_id=activity['id'] + 1)
+            return activity
+
+    def add_activities(self, activities):
+        """Assign consecutive ids to new activities and store them in a single write
+
+        Returns the stored records.
+        """
+        with self._commit_lock():
+            with self._lock:
+                self._catch_up()
+                stored = [{'id': self._next_id + offset, **activity, 'version': 1}
+                          for offset, activity in enumerate(activities)]
+            if stored:
+                self._append('create', None, activities=stored, next_id=stored[-1]['id'] + 1)
+            return stored
+
+    def update_activity(self, activity, op='edit'):
+        """Persist an activity previously returned by get_activity()
+
+        op names the change in the journal: 'status', 'approve', 'reject' or
+        'edit'. Raises ConflictError if the activity was committed by someone
+        else after it was read. Returns the stored record with its new version.
+        """
+        with self._commit_lock():
+            with self._lock:
+                self._catch_up()
+                current = self._activities.get(activity['id'])
+                if current is None:
+                    raise KeyError(activity['id'])
+                expected = activity.get('version', 0)
+                if current.get('version', 0) != expected:
+                    raise ConflictError(activity['id'], expected, current.get('version', 0))
+            activity = {**activity, 'version': expected + 1}
+            self._append(op, activity['id'], activity)
+            return activity
+
+    def update_activities(self, activities, op='status'):
+        """Persist several activities from get_activity() in a single write
+
+        Either all of them are stored or, if any was committed by someone
+        else after it was read, none is and ConflictError is raised. Returns
+        the stored records with their new versions.
+        """
+        with self._commit_lock():
+            with self._lock:
+                self._catch_up()
+                stored = []
+                for activity in activities:
+                    current = self._activities.get(activity['id'])
+                    if current is None:
+                        raise KeyError(activity['id'])
+                    expected = activity.get('version', 0)
+                    if current.get('version', 0) != expected:
+                        raise ConflictError(activity['id'], expected, current.get('version', 0))
+                    stored.append({**activity, 'version': expected + 1})
+            if stored:
+                self._append(op, None, activities=stored)
+            return stored
+
+    def delete_activity(self, activity_id):
+        """Remove an activity; returns False if it did not exist"""
+        with self._commit_lock():
+            with self._lock:
+                self._catch_up()
+                if activity_id not in self._activities:
+                    return False
+            self._append('delete', activity_id)
+        self.history.delete(activity_id)
+        return True
+
+    def count_by_responsible(self, names):
+        """Return {name: number of activities assigned to name}"""
+        with self._lock:
+            self._index()
+            return {name: len(self._by_responsible.get(name, ())) for name in names}
+
+    def has_activities(self, name):
+        """Return True if name is responsible for at least one activity"""
+        with self._lock:
+            self._index()
+            return bool(self._by_responsible.get(name))
+
+    def status_counts(self):
+        """Return the dashboard counters, maintained on every write
+
+        {'total': n, 'overall': {status: n}, 'by_responsible': {person: {status: n}}}
+        """
+        with self._lock:
+            activities = self._index()
+            by_responsible = {}
+            for (person, status), total in self._person_status_counts.items():
+                if total:
+                    by_responsible.setdefault(person, {})[status] = total
+            return {
+                'total': len(activities),
+                'overall': {status: total for status, total in self._status_counts.items() if total},
+                'by_responsible': by_responsible
+            }
+
+    def append_history(self, activity_id, entry):
+        """Append an entry to the history of an activity"""
+        self.history.append(activity_id, entry)
+
+    def append_history_batch(self, entries):
+        """Append one entry to each of several histories: [(activity_id, entry), ...]"""
+        self.history.append_batch(entries)
+
+    def get_history(self, activity_id, offset=0, limit=None):
+        """Return (entries newest first, total count) for one page of history"""
+        return self.history.read(activity_id, offset, limit)
+
+    def migrate_embedded_history(self):
+        """Move history lists stored inside activity records to the history store
+
+        Records written before history had its own store carry a 'history'
+        list. They are moved out once and the snapshot is rewritten without
+        them, so the migration does not run again.
+        """
+        with self._commit_lock(), self._lock:
+            try:
+                self._catch_up()
+            except serialization.DecodeError:
+                return
+            embedded = [act for act in self._activities.values() if 'history' in act]
+            if not embedded:
+                return
+            for activity in embedded:
+                self.history.replace(activity['id'], activity['history'])
+            for activity in embedded:
+                self._put({k: v for k, v in activity.items() if k != 'history'})
+            self.save(self._document())
+            logging.info(f"Moved history of {len(embedded)} activities to {self.history.directory}")